@@ -1,8 +1,9 @@
 import streamlit as st
 from streamlit_option_menu import option_menu  # Para crear el menú de navegación
 
-# Página y navegación (resto de imports)
-from navigation import home, graficos, predicciones, anomalias, clustering, volumen
+# Registro de páginas: cada página se importa solo cuando se selecciona por primera vez
+from utils.paginas import PAGINAS, cargar_pagina, informe_importaciones
+from utils import tiempos
 
 SDC_LOGO = "assets/SDC_Hor_250.png"
 
@@ -19,6 +20,9 @@ if "user_id" not in st.session_state:
 user_id = st.session_state["user_id"]
 # st.write(f"User ID: {user_id}")  # Sólo para verificación; puedes quitarlo luego
 
+# Los tiempos medidos a partir de aquí se atribuyen a esta ejecución de la sesión
+tiempos.iniciar_ejecucion(user_id)
+
 # Coloca la imagen en la sidebar
 st.sidebar.image(SDC_LOGO, use_container_width=True)
 
@@ -26,25 +30,31 @@ st.sidebar.image(SDC_LOGO, use_container_width=True)
 with st.sidebar:
     selected = option_menu(
         "Navegación",
-        ["Home", "Gráficos", "Predicciones de carrera", "Detección de anomalías", "Clustering de entrenamientos", "Carga semanal de entrenamientos"],
-        icons=["house", "bar-chart", "trophy", "lightbulb", "diagram-3", "calendar-week"],
+        list(PAGINAS),
+        icons=[icono for _, _, icono in PAGINAS.values()],
         menu_icon="cast",
         default_index=0
     )
 
-# Según la opción seleccionada, muestra la página correspondiente.
-if selected == "Home":
-    home.home_page(user_id)   # Envíale el user_id a la página
-elif selected == "Gráficos":
-    graficos.graficos_page(user_id)
-elif selected == "Predicciones de carrera":
-    predicciones.predicciones_page(user_id)
-elif selected == "Detección de anomalías":
-    anomalias.anomalias_page(user_id)
-elif selected == "Clustering de entrenamientos":
-    clustering.clustering_page(user_id)
-elif selected == "Carga semanal de entrenamientos":
-    volumen.volumen_semanal_page(user_id)
+# Según la opción seleccionada, muestra la página correspondiente (se le envía el user_id)
+with tiempos.medir(f"pagina.{selected}"):
+    cargar_pagina(selected)(user_id)
+
+# Informe del coste de importación de las páginas (añadir ?debug=1 a la URL para verlo)
+if st.query_params.get("debug"):
+    with st.sidebar.expander("⏱️ Tiempos de importación"):
+        st.json(informe_importaciones())
+    with st.sidebar.expander("⏱️ Rendimiento"):
+        informe = tiempos.informe(user_id)
+        st.caption("Última ejecución")
+        st.dataframe(informe["ultima_ejecucion"], hide_index=True,
+                     column_order=["nombre", "nivel", "segundos", "padre"])
+        for titulo, clave in [("Sesión", "agregado_sesion"), ("Proceso", "agregado_proceso")]:
+            st.caption(titulo)
+            st.dataframe([{"tramo": nombre, **estadisticas} for nombre, estadisticas in informe[clave].items()],
+                         hide_index=True)
+        st.download_button("Descargar JSON", tiempos.exportar_json(user_id),
+                           file_name="tiempos.json", mime="application/json")
 
 # Información y contacto en la sidebar
 st.sidebar.markdown('## 🤝 Sobre mí')
@@ -0,0 +1,44 @@
+import argparse
+import time
+import warnings
+from sklearn.metrics import mean_absolute_error
+from sklearn.model_selection import train_test_split
+from sklearn.impute import SimpleImputer
+from sklearn.preprocessing import RobustScaler
+from benchmarks.sintetico import generar_actividades_garmin
+from utils.garmin_sync import normalizar_actividades
+from utils.data_manager import tipar_actividades
+from utils.caracteristicas import materializar_caracteristicas
+from utils.entrenamiento import busqueda_paralela, busqueda_halving
+from utils.predicciones import preparar_datos, crear_modelos, PARAM_DISTRIBUTIONS, FEATURES, OBJETIVO
+
+# Compara MAE y tiempo de la búsqueda aleatoria con la búsqueda con presupuesto (successive halving)
+# sobre carreras sintéticas.
+# Uso: python -m benchmarks.bench_busqueda --actividades 1000 5000 --presupuesto 30
+
+def medir(nombre, buscar, X_train, X_test, y_train, y_test):
+    inicio = time.perf_counter()
+    best_models, best_scores, _, _ = buscar(crear_modelos(), PARAM_DISTRIBUTIONS, X_train, y_train)
+    segundos = time.perf_counter() - inicio
+    mae_test = {name: mean_absolute_error(y_test, modelo.predict(X_test)) for name, modelo in best_models.items()}
+    mejor = min(best_scores, key=best_scores.get)
+    return {"busqueda": nombre, "segundos": round(segundos, 2), "mejor_modelo": mejor,
+            "mae_test_mejor": round(mae_test[mejor], 4),
+            "mae_test_por_modelo": {name: round(mae, 4) for name, mae in mae_test.items()}}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--actividades", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--presupuesto", type=int, default=30)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore")
+
+    for n in args.actividades:
+        df = preparar_datos(materializar_caracteristicas(tipar_actividades(normalizar_actividades(generar_actividades_garmin(n)))))
+        X = RobustScaler().fit_transform(SimpleImputer(strategy="median").fit_transform(df[FEATURES]))
+        X_train, X_test, y_train, y_test = train_test_split(X, df[OBJETIVO], test_size=0.2, random_state=42)
+        print(f"--- {len(df)} carreras ---")
+        print(medir("aleatoria", lambda *a: busqueda_paralela(*a, n_workers=args.workers), X_train, X_test, y_train, y_test))
+        print(medir(f"halving ({args.presupuesto} s)", lambda *a: busqueda_halving(*a, presupuesto_segundos=args.presupuesto, n_workers=args.workers),
+                    X_train, X_test, y_train, y_test))
@@ -0,0 +1,92 @@
+import argparse
+import time
+import warnings
+import pandas as pd
+from benchmarks.sintetico import generar_actividades_garmin
+from utils import almacen
+from utils.caracteristicas import materializar_caracteristicas
+from utils.carga import TIPOS_CARGA, actualizar_carga, calcular_carga, carga_diaria, dias_actividades
+from utils.garmin_sync import normalizar_actividades
+from utils.data_manager import tipar_actividades
+
+# Comprueba que la actualización incremental de la carga de entrenamiento deja guardada la misma
+# serie que recalcularla entera, y que es más rápida: las dos miden actualizar_carga, incluida la
+# lectura y escritura en el almacén, pero la incremental solo lee el día anterior al primero nuevo
+# y solo reescribe los días siguientes. Se guarda la serie de las actividades anteriores a los
+# últimos `--dias` días y se añaden las de esos días, indicando el primer día nuevo (como hace la
+# sincronización) o dejando que se detecte comparando las actividades de cada día. También se
+# comprueba el caso de una actividad antigua que aparece después (se recalcula desde su día).
+# Las actividades llevan las columnas derivadas, como las que sirve la caché de datos. El
+# generador sintético crea dos actividades al día: 7300 actividades son 10 años.
+# Uso: python -m benchmarks.bench_carga --tamanos 7300 36500 --dias 7
+
+USUARIO = "benchmark"
+
+def limpiar():
+    almacen.eliminar_usuario(USUARIO)
+
+# Serie completa calculada desde cero con todas las actividades
+def carga_completa(df):
+    return calcular_carga(carga_diaria(df))
+
+# Guardar la serie de las actividades `previas` (None para no tener serie guardada)
+def preparar(previas):
+    if previas is None:
+        almacen.borrar("carga", USUARIO)
+    else:
+        almacen.reemplazar("carga", USUARIO, carga_completa(previas))
+
+# Serie guardada en el almacén
+def guardada():
+    return almacen.leer("carga", USUARIO, tipos=TIPOS_CARGA)
+
+# Serie guardada tras actualizar la de las actividades `previas`
+def carga_incremental(previas, df, desde=None):
+    preparar(previas)
+    actualizar_carga(USUARIO, df, desde=desde)
+    return guardada()
+
+# Tiempo medio de actualizar_carga partiendo cada vez de la serie de `previas`
+def medir(previas, df, desde, repeticiones):
+    total = 0.0
+    for _ in range(repeticiones):
+        preparar(previas)
+        inicio = time.perf_counter()
+        actualizar_carga(USUARIO, df, desde=desde)
+        total += time.perf_counter() - inicio
+    return guardada(), total / repeticiones
+
+def comprobar(incremental, completa):
+    pd.testing.assert_frame_equal(incremental.reset_index(drop=True), completa, check_dtype=False)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[7300, 36500])
+    parser.add_argument("--dias", type=int, default=7, help="Días de actividades nuevas")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore")
+
+    try:
+        for n in args.tamanos:
+            df = materializar_caracteristicas(tipar_actividades(normalizar_actividades(generar_actividades_garmin(n))))
+            dias = dias_actividades(df)
+            desde = dias.max() - pd.Timedelta(days=args.dias - 1)
+            previas = df[dias < desde]
+
+            completa = carga_completa(df)
+            recalculada, t_completa = medir(None, df, None, args.repeticiones)
+            incremental, t_incremental = medir(previas, df, desde, args.repeticiones)
+            comprobar(recalculada, completa)
+            comprobar(incremental, completa)
+            comprobar(carga_incremental(previas, df), completa)
+            assert t_incremental < t_completa, f"La actualización incremental ({t_incremental:.4f} s) no es más rápida que la completa ({t_completa:.4f} s)"
+
+            # Una actividad de la mitad de la serie que no estaba en la guardada
+            antigua = dias.sort_values().index[len(df) // 2]
+            comprobar(carga_incremental(df.drop(index=antigua), df), completa)
+
+            print({"actividades": n, "dias": len(completa), "dias_nuevos": args.dias, "series_iguales": True,
+                   "completa_s": round(t_completa, 4), "incremental_s": round(t_incremental, 4)})
+    finally:
+        limpiar()
@@ -0,0 +1,50 @@
+import argparse
+import time
+import warnings
+from sklearn.cluster import DBSCAN
+from sklearn.preprocessing import StandardScaler
+from benchmarks.sintetico import generar_actividades_garmin
+from utils.garmin_sync import normalizar_actividades
+from utils.data_manager import tipar_actividades
+from utils.caracteristicas import materializar_caracteristicas
+from utils import agrupamiento
+
+# Compara el tiempo de mover los sliders de la página de clustering (un DBSCAN por movimiento)
+# con el motor precalculado de utils.agrupamiento, y cuenta los puntos con distinta etiqueta.
+# Uso: python -m benchmarks.bench_clustering --actividades 5000 40000
+
+COLUMNAS = ['Distancia (m)', 'Tiempo (s)', 'Velocidad_Media', 'Elevación Ganada (m)', 'Frecuencia Cardíaca Media']
+MOVIMIENTOS = [(eps, m) for m in (3, 5) for eps in (0.2, 0.3, 0.4, 0.5, 0.6)]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--actividades", type=int, nargs="+", default=[5000, 40000])
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore")
+
+    for n in args.actividades:
+        df = materializar_caracteristicas(tipar_actividades(normalizar_actividades(generar_actividades_garmin(n))))
+        X = StandardScaler().fit_transform(df[df['Deporte'].isin(['running', 'cycling'])][COLUMNAS].dropna())
+
+        # Precálculo: vecinos y árboles de los min_samples usados (se esperan a que terminen)
+        inicio = time.perf_counter()
+        agrupamiento.etiquetas_dbscan(X, 0.5, 3)
+        version = agrupamiento._version(X)
+        while any(m not in version["arboles"] for m in (3, 5)):
+            time.sleep(0.05)
+        t_precalculo = time.perf_counter() - inicio
+
+        t_dbscan = t_motor = 0.0
+        distintos = 0
+        for eps, m in MOVIMIENTOS:
+            inicio = time.perf_counter()
+            original = DBSCAN(eps=eps, min_samples=m).fit_predict(X)
+            t_dbscan += time.perf_counter() - inicio
+            inicio = time.perf_counter()
+            nuevo = agrupamiento.etiquetas_dbscan(X, eps, m)
+            t_motor += time.perf_counter() - inicio
+            distintos += int((original != nuevo).sum())
+        print({"actividades": len(X), "precalculo_s": round(t_precalculo, 2),
+               "dbscan_por_movimiento_s": round(t_dbscan / len(MOVIMIENTOS), 4),
+               "motor_por_movimiento_s": round(t_motor / len(MOVIMIENTOS), 4),
+               "puntos_frontera_distintos": distintos})
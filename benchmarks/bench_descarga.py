@@ -0,0 +1,35 @@
+import argparse
+import time
+from benchmarks.sintetico import generar_actividades_garmin, ClienteGarminFalso
+from utils import almacen
+from utils.garmin_sync import sincronizar_actividades
+
+# Compara la descarga secuencial con la paginada en paralelo contra un cliente falso con latencia.
+# Uso: python -m benchmarks.bench_descarga --actividades 5000 --latencia 0.2
+
+def limpiar(user_id):
+    almacen.eliminar_usuario(user_id)
+
+def medir(actividades, latencia, max_workers, user_id="benchmark"):
+    limpiar(user_id)
+    client = ClienteGarminFalso(actividades, latencia)
+    primera_pagina = []
+    inicio = time.perf_counter()
+    progreso = lambda descargadas, fraccion: primera_pagina.append(time.perf_counter() - inicio) if not primera_pagina else None
+    df, _ = sincronizar_actividades(client, user_id, max_workers=max_workers, progreso=progreso)
+    total = time.perf_counter() - inicio
+    limpiar(user_id)
+    return {"workers": max_workers, "actividades": len(df), "peticiones": client.peticiones,
+            "primera_pagina_s": round(primera_pagina[0], 3), "total_s": round(total, 3),
+            "actividades_por_s": round(len(df) / total, 1)}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--actividades", type=int, default=5000)
+    parser.add_argument("--latencia", type=float, default=0.2)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    actividades = generar_actividades_garmin(args.actividades)
+    for workers in args.workers:
+        print(medir(actividades, args.latencia, workers))
@@ -0,0 +1,67 @@
+import argparse
+import itertools
+import time
+import warnings
+from benchmarks.sintetico import generar_actividades_garmin
+from utils.garmin_sync import normalizar_actividades
+from utils.data_manager import tipar_actividades
+from utils.caracteristicas import materializar_caracteristicas
+from utils import graficos
+
+# Compara la preparación de los datos de la página de gráficos (calendario, tarta y barras de un
+# año) de la implementación original con la vectorizada, sin caché y con la caché ya llena
+# (cambiar de año en el selector). El generador sintético crea dos actividades al día.
+# Uso: python -m benchmarks.bench_graficos --tamanos 7300 14600
+
+# Implementación original (groupby.apply con sample, iterrows y list.index), como referencia
+def graficos_original(df, año):
+    df = df.dropna(subset=["Fecha de Inicio", "Deporte"])
+    deportes = sorted(df["Deporte"].unique())
+    colores = {deporte: graficos.PALETA[i % len(graficos.PALETA)] for i, deporte in enumerate(deportes)}
+    filtrado = df[df["Año"] == año]
+    diario = filtrado.groupby("Fecha").apply(lambda x: x.sample(1)).reset_index(drop=True)
+    calendario = [(str(row["Fecha"].date()), deportes.index(row["Deporte"]) + 1) for _, row in diario.iterrows()]
+    piezas = [{"value": deportes.index(d) + 1, "label": d, "color": colores[d]} for d in diario["Deporte"].unique()]
+    por_deporte = diario["Deporte"].value_counts().loc[lambda s: s > 0]
+    tarta = [[d, int(c)] for d, c in zip(por_deporte.index, por_deporte.values)]
+    calorias = filtrado.groupby("Deporte", observed=True)["Calorías"].sum().reset_index().sort_values("Calorías", ascending=False)
+    barras = [(row["Deporte"], round(row["Calorías"], 1), colores[row["Deporte"]]) for _, row in calorias.iterrows()]
+    return calendario, piezas, tarta, barras
+
+def graficos_vectorizado(df, año, version):
+    datos = graficos.datos_año("bench", version, df, año)
+    return datos["calendario"], datos["piezas"], datos["tarta"], graficos.datos_barras("bench", version, df, año, "Calorías totales")
+
+def medir(funcion, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        resultado = funcion()
+    return resultado, (time.perf_counter() - inicio) / repeticiones
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[7300, 14600])
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore")
+
+    for n in args.tamanos:
+        df = materializar_caracteristicas(tipar_actividades(normalizar_actividades(generar_actividades_garmin(n))))
+        años = sorted(df["Año"].dropna().unique())
+        original, t_original = medir(lambda: [graficos_original(df, año) for año in años], args.repeticiones)
+
+        # Sin caché: cada repetición usa una versión distinta de los datos
+        versiones = itertools.count(1)
+        def sin_cache():
+            version = (n, next(versiones))
+            return [graficos_vectorizado(df, año, version) for año in años]
+        nuevo, t_frio = medir(sin_cache, args.repeticiones)
+        _, t_cache = medir(lambda: [graficos_vectorizado(df, año, (n, 1)) for año in años], args.repeticiones)
+
+        # El calendario original elige una actividad al azar por día: solo se comparan los días
+        for (cal_o, _, _, barras_o), (cal_n, _, _, barras_n) in zip(original, nuevo):
+            assert [dia for dia, _ in cal_o] == [dia for dia, _ in cal_n]
+            assert barras_o == barras_n
+        print({"actividades": n, "años": len(años), "original_s": round(t_original, 4),
+               "vectorizado_s": round(t_frio, 4), "cacheado_s": round(t_cache, 6),
+               "aceleracion": round(t_original / t_frio, 1)})
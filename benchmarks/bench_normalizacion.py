@@ -0,0 +1,86 @@
+import argparse
+import time
+import pandas as pd
+from benchmarks.sintetico import generar_actividades_garmin
+from utils.garmin_sync import normalizar_actividades
+from utils.data_manager import tipar_actividades
+
+# Compara la normalización vectorizada de actividades con el bucle original por actividad.
+# Uso: python -m benchmarks.bench_normalizacion --tamanos 5000 50000
+
+# Implementación original (bucle por actividad), como referencia
+def normalizar_bucle(activities):
+    activity_data = []
+    for act in activities:
+        sport = act["activityType"]["typeKey"]
+        cadence = act.get("averageRunningCadenceInStepsPerMinute") if sport == "running" else act.get("averageBikeCadence")
+        max_cadence = act.get("maxRunningCadenceInStepsPerMinute") if sport == "running" else act.get("maxBikeCadence")
+
+        lat = act.get("startLatitude")
+        lon = act.get("startLongitude")
+        elevation_gain = act.get("elevationGain")
+        elevation_loss = act.get("elevationLoss")
+        temperature = act.get("temperature")
+
+        hr_zones = ["hrTimeInZone_1", "hrTimeInZone_2", "hrTimeInZone_3", "hrTimeInZone_4", "hrTimeInZone_5"]
+        time_in_zones = {zone: act.get(zone, 0) for zone in hr_zones}
+
+        distance = act.get("distance")
+        duration = act.get("duration")
+        avg_pace = (duration / 60) / (distance / 1000) if distance and duration else None
+
+        activity_data.append({
+            "Activity ID": act["activityId"],
+            "Nombre de la Actividad": act.get("activityName"),
+            "Fecha de Inicio": act.get("startTimeLocal"),
+            "Deporte": sport,
+            "Duración (min)": duration / 60 if duration else None,
+            "Distancia (m)": distance,
+            "Ritmo medio (min/km)": avg_pace,
+            "Velocidad media (m/s)": act.get("averageSpeed"),
+            "Velocidad máxima (m/s)": act.get("maxSpeed"),
+            "Calorías": act.get("calories"),
+            "Tasa Metabólica Basal": act.get("bmrCalories"),
+            "Frecuencia Cardíaca Media": act.get("averageHR"),
+            "Frecuencia Cardíaca Máxima": act.get("maxHR"),
+            "Tiempo en Zona 1 (s)": time_in_zones["hrTimeInZone_1"],
+            "Tiempo en Zona 2 (s)": time_in_zones["hrTimeInZone_2"],
+            "Tiempo en Zona 3 (s)": time_in_zones["hrTimeInZone_3"],
+            "Tiempo en Zona 4 (s)": time_in_zones["hrTimeInZone_4"],
+            "Tiempo en Zona 5 (s)": time_in_zones["hrTimeInZone_5"],
+            "VO2Max": act.get("vO2MaxValue"),
+            "Cadencia Media (spm)": cadence,
+            "Cadencia Máxima (spm)": max_cadence,
+            "Elevación Ganada (m)": elevation_gain,
+            "Elevación Perdida (m)": elevation_loss,
+            "Potencia Media (W)": act.get("averagePower"),
+            "Potencia Máxima (W)": act.get("maxPower"),
+            "Temperatura (°C)": temperature,
+            "Latitud": lat,
+            "Longitud": lon,
+            "Lugar": act.get("locationName")
+        })
+
+    return pd.DataFrame(activity_data)
+
+def medir(funcion, actividades, repeticiones=3):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        df = funcion(actividades)
+        tiempos.append(time.perf_counter() - inicio)
+    return df, min(tiempos)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[5000, 50000])
+    args = parser.parse_args()
+
+    for n in args.tamanos:
+        actividades = generar_actividades_garmin(n)
+        df_bucle, t_bucle = medir(normalizar_bucle, actividades)
+        df_vector, t_vector = medir(normalizar_actividades, actividades)
+        # Ambas implementaciones deben producir el mismo dataset una vez tipado
+        pd.testing.assert_frame_equal(tipar_actividades(df_bucle), tipar_actividades(df_vector))
+        print({"actividades": n, "bucle_s": round(t_bucle, 4), "vectorizado_s": round(t_vector, 4),
+               "aceleracion": round(t_bucle / t_vector, 2)})
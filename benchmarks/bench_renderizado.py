@@ -0,0 +1,44 @@
+import argparse
+import time
+import warnings
+import plotly.express as px
+from benchmarks.sintetico import generar_actividades_garmin
+from utils.garmin_sync import normalizar_actividades
+from utils.data_manager import tipar_actividades
+from utils.carga import calcular_carga, carga_diaria
+from utils.renderizado import MAX_PUNTOS_SERIE, modo_render, reducir_serie
+
+# Tamaño del gráfico de carga diaria (ATL, CTL y TSB) que se envía al navegador, con la serie
+# completa en SVG y reducida con LTTB, y tiempo de la reducción. El generador sintético crea dos
+# actividades al día, así que 7300 actividades son 10 años.
+# Uso: python -m benchmarks.bench_renderizado --tamanos 7300 36500
+
+COLUMNAS = ["ATL", "CTL", "TSB"]
+
+def tamano_figura(serie, render_mode):
+    fig = px.line(serie, x="Fecha", y=COLUMNAS, render_mode=render_mode)
+    return len(fig.to_json())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[7300, 36500])
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore")
+
+    for n in args.tamanos:
+        df = tipar_actividades(normalizar_actividades(generar_actividades_garmin(n)))
+        carga = calcular_carga(carga_diaria(df))
+
+        inicio = time.perf_counter()
+        for _ in range(args.repeticiones):
+            reducida = reducir_serie(carga, "Fecha", COLUMNAS)
+        segundos = (time.perf_counter() - inicio) / args.repeticiones
+
+        # Si LTTB ha conservado el máximo y el mínimo de todas las series
+        extremos = all(reducida[col].max() == carga[col].max() and reducida[col].min() == carga[col].min() for col in COLUMNAS)
+        print({"dias": len(carga), "puntos_reducidos": len(reducida), "max_puntos_serie": MAX_PUNTOS_SERIE,
+               "extremos_conservados": extremos,
+               "lttb_s": round(segundos, 4),
+               "kb_svg_completo": round(tamano_figura(carga, "svg") / 1024, 1),
+               "kb_reducido": round(tamano_figura(reducida, modo_render(3 * len(reducida))) / 1024, 1)})
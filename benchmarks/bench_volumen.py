@@ -0,0 +1,55 @@
+import argparse
+import time
+import warnings
+import pandas as pd
+from benchmarks.sintetico import generar_actividades_garmin
+from utils.garmin_sync import normalizar_actividades
+from utils.data_manager import tipar_actividades
+from utils.volumen import calcular_volumen_semanal
+
+# Compara el cálculo vectorizado del volumen semanal con la implementación original.
+# El generador sintético crea dos actividades al día, así que 7300 actividades son 10 años.
+# Uso: python -m benchmarks.bench_volumen --tamanos 7300 36500
+
+# Implementación original (etiquetas con apply por fila y agregaciones que filtran el DataFrame
+# completo dentro de cada grupo), como referencia
+def volumen_original(df):
+    df = df.copy()
+    df['Fecha de Inicio'] = pd.to_datetime(df['Fecha de Inicio'], errors='coerce')
+    df = df.dropna(subset=['Fecha de Inicio'])
+    df['Semana'] = df['Fecha de Inicio'].dt.to_period('W').apply(lambda r: f"{r.start_time.date()} a {r.end_time.date()}")
+    resumen = df.groupby('Semana').agg(
+        Kilometros_Running=('Distancia (m)', lambda x: x[df['Deporte'] == 'running'].sum() / 1000),
+        Kilometros_Cycling=('Distancia (m)', lambda x: x[df['Deporte'] == 'cycling'].sum() / 1000),
+        Tiempo_Total=('Duración (min)', lambda x: x.sum() / 60),
+        Dias_Entrenamiento=('Fecha de Inicio', 'count'),
+        FC_Reposo=('Tasa Metabólica Basal', 'mean')
+    ).reset_index()
+    for km, cambio in [('Kilometros_Running', 'Cambio_Km_Running %'), ('Kilometros_Cycling', 'Cambio_Km_Cycling %'),
+                       ('Tiempo_Total', 'Cambio_Tiempo_Total %')]:
+        resumen[cambio] = resumen[km].pct_change() * 100
+        resumen[cambio] = resumen[cambio].replace([float('inf'), -float('inf')], 100).fillna(0)
+    resumen['Riesgo_Lesion'] = resumen['Cambio_Tiempo_Total %'].apply(lambda x: 'Alto' if x > 20 else 'Normal')
+    resumen['Ratio_Carga'] = resumen['Tiempo_Total'] / resumen['Tiempo_Total'].mean()
+    return resumen
+
+def medir(funcion, df, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        resultado = funcion(df)
+    return resultado, (time.perf_counter() - inicio) / repeticiones
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[7300, 36500])
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore")
+
+    for n in args.tamanos:
+        df = tipar_actividades(normalizar_actividades(generar_actividades_garmin(n)))
+        original, t_original = medir(volumen_original, df, args.repeticiones)
+        nuevo, t_nuevo = medir(calcular_volumen_semanal, df, args.repeticiones)
+        pd.testing.assert_frame_equal(original, nuevo[original.columns], check_dtype=False)
+        print({"actividades": n, "semanas": len(nuevo), "original_s": round(t_original, 4),
+               "vectorizado_s": round(t_nuevo, 4), "aceleracion": round(t_original / t_nuevo, 1)})
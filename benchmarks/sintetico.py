@@ -0,0 +1,172 @@
+import random
+import time
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from utils.data_manager import tipar_actividades
+
+# Generadores de actividades sintéticas: con el formato JSON que devuelve Garmin Connect o
+# directamente como DataFrame con el esquema de las actividades
+DEPORTES = ["running", "running", "running", "cycling", "strength_training", "treadmill_running", "walking", "lap_swimming"]
+
+def generar_actividades_garmin(n, semilla=42):
+    rnd = random.Random(semilla)
+    inicio = datetime(2015, 1, 1, 7, 0, 0)
+    actividades = []
+    for i in range(n):
+        deporte = rnd.choice(DEPORTES)
+        fc_media = rnd.uniform(100, 170)
+        desnivel = rnd.uniform(0, 1500)
+        if deporte == "strength_training":
+            distancia = None
+            duracion = rnd.uniform(900, 5400)
+        else:
+            distancia = rnd.uniform(3000, 42500) if "running" in deporte else rnd.uniform(1000, 60000)
+            # La velocidad depende de la intensidad, del desnivel y (en carrera) de la distancia
+            velocidad = 2.0 + 0.02 * (fc_media - 100) - 0.8 * desnivel / distancia - 0.01 * distancia / 1000
+            if deporte == "cycling":
+                velocidad *= 2.5
+            velocidad = max(velocidad + rnd.gauss(0, 0.15), 0.8)
+            duracion = distancia / velocidad
+        act = {
+            "activityId": 10_000_000 + i,
+            "activityName": f"Actividad {i}",
+            "startTimeLocal": (inicio + timedelta(hours=12 * i)).strftime("%Y-%m-%d %H:%M:%S"),
+            "activityType": {"typeKey": deporte},
+            "distance": distancia,
+            "duration": duracion,
+            "averageSpeed": distancia / duracion if distancia else None,
+            "maxSpeed": rnd.uniform(3, 15),
+            "calories": rnd.uniform(100, 1500),
+            "bmrCalories": rnd.uniform(30, 200),
+            "averageHR": fc_media,
+            "maxHR": rnd.uniform(150, 195),
+            "vO2MaxValue": rnd.choice([None, None, rnd.uniform(45, 60)]),
+            "averageRunningCadenceInStepsPerMinute": rnd.uniform(150, 185),
+            "maxRunningCadenceInStepsPerMinute": rnd.uniform(180, 210),
+            "averageBikeCadence": rnd.uniform(70, 95),
+            "maxBikeCadence": rnd.uniform(100, 130),
+            "elevationGain": desnivel,
+            "elevationLoss": rnd.uniform(0, 1500),
+            "startLatitude": rnd.uniform(36, 43),
+            "startLongitude": rnd.uniform(-9, 3),
+            "locationName": rnd.choice(["Madrid", "Sevilla", "Conil de la Frontera", None]),
+        }
+        # No todas las actividades traen tiempo en zonas, temperatura o potencia
+        for zona in range(1, 6):
+            if rnd.random() < 0.9:
+                act[f"hrTimeInZone_{zona}"] = rnd.uniform(0, 1800)
+        if rnd.random() < 0.5:
+            act["temperature"] = rnd.uniform(0, 35)
+        if deporte == "cycling" and rnd.random() < 0.5:
+            act["averagePower"] = rnd.uniform(120, 280)
+            act["maxPower"] = rnd.uniform(400, 900)
+        actividades.append(act)
+    # Garmin devuelve primero las actividades más recientes
+    return actividades[::-1]
+
+# Proporción de cada deporte en el DataFrame sintético (parecida a la de un triatleta)
+MEZCLA_DEPORTES = {
+    "running": 0.55,
+    "cycling": 0.12,
+    "strength_training": 0.12,
+    "treadmill_running": 0.08,
+    "walking": 0.05,
+    "lap_swimming": 0.05,
+    "hiking": 0.03,
+}
+
+# Distancia (m) de cada deporte y factor de su velocidad respecto a la de carrera
+DISTANCIAS = {
+    "running": (3000, 42500), "cycling": (10000, 120000), "strength_training": (0, 0), "treadmill_running": (2000, 15000),
+    "walking": (2000, 15000), "lap_swimming": (500, 4000), "hiking": (5000, 25000),
+}
+FACTOR_VELOCIDAD = {"cycling": 2.5, "walking": 0.6, "hiking": 0.5, "lap_swimming": 0.45}
+
+# Deportes sin GPS (sin coordenadas ni desnivel)
+DEPORTES_INTERIOR = ["strength_training", "treadmill_running", "lap_swimming"]
+
+LUGARES = ["Madrid", "Sevilla", "Conil de la Frontera", "Granada", "Valencia"]
+
+# Generar directamente un DataFrame de `n` actividades con el esquema de actividades_muestra.csv
+# (ya tipado, de la más reciente a la más antigua), con valores que faltan como en los datos
+# reales: potencia solo en parte del ciclismo, VO2Max solo en parte de la carrera, sin coordenadas
+# ni desnivel en interior, etc. Está vectorizado para poder generar millones de filas.
+def generar_dataframe(n, semilla=42):
+    rng = np.random.default_rng(semilla)
+    deportes = rng.choice(list(MEZCLA_DEPORTES), size=n, p=list(MEZCLA_DEPORTES.values()))
+    es = {deporte: deportes == deporte for deporte in MEZCLA_DEPORTES}
+    interior = np.isin(deportes, DEPORTES_INTERIOR)
+    carrera = es["running"] | es["treadmill_running"]
+
+    # Fechas: hasta 30 años de historial con ~1,5 actividades al día
+    dias = min(n / 1.5, 365 * 30)
+    fin = pd.Timestamp("2025-06-01")
+    fechas = np.sort(fin - pd.to_timedelta(rng.uniform(0, dias * 86400, n), unit="s").floor("s"))
+
+    fc_media = rng.uniform(100, 170, n)
+    desnivel = np.where(interior, np.nan, rng.uniform(0, 600, n) * np.where(es["cycling"] | es["hiking"], 2.5, 1))
+    distancia = np.zeros(n)
+    factor = np.ones(n)
+    for deporte, (minimo, maximo) in DISTANCIAS.items():
+        distancia[es[deporte]] = rng.uniform(minimo, maximo, es[deporte].sum())
+        factor[es[deporte]] = FACTOR_VELOCIDAD.get(deporte, 1)
+
+    # La velocidad depende de la intensidad, del desnivel y de la distancia
+    with np.errstate(divide="ignore", invalid="ignore"):
+        velocidad = 2.0 + 0.02 * (fc_media - 100) - 0.8 * np.nan_to_num(desnivel) / distancia - 0.01 * distancia / 1000
+    velocidad = np.maximum(np.nan_to_num(velocidad * factor) + rng.normal(0, 0.15, n), 0.5)
+    duracion = np.where(es["strength_training"], rng.uniform(900, 5400, n), distancia / velocidad)
+    velocidad = np.where(es["strength_training"], 0.0, velocidad)
+
+    # Tiempo en zonas: reparto aleatorio de la duración (un 10% de actividades sin zonas)
+    zonas = rng.dirichlet(np.ones(5), n) * duracion[:, None]
+    zonas[rng.random(n) < 0.1] = np.nan
+
+    con_gps = ~interior
+    con_potencia = es["cycling"] & (rng.random(n) < 0.5)
+    df = pd.DataFrame({
+        "Activity ID": 10_000_000 + np.arange(n),
+        "Nombre de la Actividad": pd.Series(deportes).str.replace("_", " ").str.capitalize() + " " + pd.Series(np.arange(n)).astype(str),
+        "Fecha de Inicio": fechas,
+        "Deporte": deportes,
+        "Duración (min)": duracion / 60,
+        "Distancia (m)": distancia,
+        "Ritmo medio (min/km)": np.where(distancia > 0, (duracion / 60) / np.maximum(distancia, 1) * 1000, np.nan),
+        "Velocidad media (m/s)": velocidad,
+        "Velocidad máxima (m/s)": np.where(distancia > 0, velocidad * rng.uniform(1.2, 2, n), np.nan),
+        "Calorías": duracion / 60 * rng.uniform(8, 14, n),
+        "Tasa Metabólica Basal": rng.uniform(30, 200, n),
+        "Frecuencia Cardíaca Media": np.where(rng.random(n) < 0.03, np.nan, fc_media),
+        "Frecuencia Cardíaca Máxima": rng.uniform(150, 195, n),
+        **{f"Tiempo en Zona {z} (s)": zonas[:, z - 1] for z in range(1, 6)},
+        "VO2Max": np.where(carrera & (rng.random(n) < 0.5), rng.uniform(45, 60, n), np.nan),
+        "Cadencia Media (spm)": np.where(carrera | es["walking"] | es["hiking"], rng.uniform(150, 185, n),
+                                         np.where(es["cycling"], rng.uniform(70, 95, n), np.nan)),
+        "Cadencia Máxima (spm)": np.where(carrera | es["walking"] | es["hiking"], rng.uniform(180, 210, n),
+                                          np.where(es["cycling"], rng.uniform(100, 130, n), np.nan)),
+        "Elevación Ganada (m)": desnivel,
+        "Elevación Perdida (m)": np.where(interior, np.nan, desnivel * rng.uniform(0.8, 1.2, n)),
+        "Potencia Media (W)": np.where(con_potencia, rng.uniform(120, 280, n), np.nan),
+        "Potencia Máxima (W)": np.where(con_potencia, rng.uniform(400, 900, n), np.nan),
+        "Temperatura (°C)": np.where(rng.random(n) < 0.5, rng.uniform(0, 35, n), np.nan),
+        "Latitud": np.where(con_gps, rng.uniform(36, 43, n), np.nan),
+        "Longitud": np.where(con_gps, rng.uniform(-9, 3, n), np.nan),
+        "Lugar": pd.Series(rng.choice(LUGARES, n)).where(con_gps),
+    })
+    return tipar_actividades(df.iloc[::-1].reset_index(drop=True))
+
+# Cliente falso de Garmin con latencia por petición inyectable
+class ClienteGarminFalso:
+    def __init__(self, actividades, latencia=0.0):
+        self.actividades = actividades
+        self.latencia = latencia
+        self.peticiones = 0
+
+    def login(self):
+        pass
+
+    def get_activities(self, start, limit):
+        self.peticiones += 1
+        time.sleep(self.latencia)
+        return self.actividades[start:start + limit]
@@ -0,0 +1,179 @@
+import argparse
+import datetime
+import itertools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+import numpy as np
+from benchmarks.sintetico import generar_dataframe
+from utils.caracteristicas import materializar_caracteristicas
+from utils import agrupamiento, graficos
+from utils import modelos as almacen_modelos
+from utils.anomalias import puntuar_deportes
+from utils.carga import calcular_carga, carga_diaria
+from utils.volumen import calcular_volumen_semanal
+from utils.clustering import aplicar_clustering
+from utils.predicciones import MODO_ALEATORIA, configuracion_busqueda, entrenar_modelos, predecir_curva, preparar_datos
+
+# Suite de benchmarks de las funciones de cálculo de cada página.
+# Genera DataFrames sintéticos con el esquema de actividades_muestra.csv, ejecuta cada función sin
+# Streamlit y guarda el tiempo (el mejor de las repeticiones) y el pico de memoria (medido con
+# tracemalloc en una ejecución aparte) en un JSON que se puede comparar con el de otro commit.
+# Uso:
+#   python -m benchmarks.suite --tamanos 1000 10000 --salida base.json
+#   python -m benchmarks.suite --tamanos 1000 10000 --comparar base.json --tolerancia 0.25
+
+TAMANOS = [1_000, 10_000, 100_000, 1_000_000]
+DIRECTORIO_RESULTADOS = os.path.join("benchmarks", "resultados")
+
+# Diferencia absoluta mínima para considerar una regresión (evita falsos positivos por ruido en
+# los casos que tardan milisegundos)
+DIFERENCIA_MINIMA = {"segundos": 0.05, "pico_mb": 1.0}
+
+# Tolerancia mínima de los casos más ruidosos: el entrenamiento de las predicciones reparte las
+# tareas en el pool de procesos y su tiempo varía más de un 25% entre dos ejecuciones del mismo commit
+TOLERANCIA_MINIMA = {"predicciones": 0.6}
+
+_versiones = itertools.count()
+
+# Datos de todos los años de la página de gráficos, sin caché (versión distinta en cada ejecución)
+def _graficos(df):
+    version = ("suite", next(_versiones))
+    for año in graficos.datos_generales("suite", version, df)["años"]:
+        graficos.datos_año("suite", version, df, año)
+        graficos.datos_barras("suite", version, df, año, "Calorías totales")
+
+# Ajuste y puntuación de los detectores de anomalías de todos los deportes, con un almacén de
+# modelos vacío
+def _anomalias(df):
+    directorio, almacen_modelos.MODELOS_DIR = almacen_modelos.MODELOS_DIR, tempfile.mkdtemp()
+    try:
+        puntuar_deportes("suite", df, guardar=False)
+    finally:
+        shutil.rmtree(almacen_modelos.MODELOS_DIR, ignore_errors=True)
+        almacen_modelos.MODELOS_DIR = directorio
+
+# Clustering con los valores por defecto de los sliders, sin vecinos ni árboles precalculados (los
+# datos se alteran mínimamente en cada ejecución para que sean una versión nueva)
+def _clustering(df):
+    aplicar_clustering(df.assign(**{"Distancia (m)": df["Distancia (m)"] + next(_versiones) * 1e-6}))
+
+# Entrenamiento completo de los modelos de predicción (búsqueda aleatoria, de coste fijo) y curva
+# de predicciones
+def _predicciones(df):
+    df = preparar_datos(df)
+    resultado = entrenar_modelos(df, configuracion_busqueda(MODO_ALEATORIA))
+    predecir_curva(resultado, df, np.arange(1000, 50001, 500))
+
+# Casos: nombre -> (función que recibe el DataFrame, máximo de filas con el que se ejecuta)
+CASOS = {
+    "volumen": (calcular_volumen_semanal, None),
+    "carga": (lambda df: calcular_carga(carga_diaria(df)), None),
+    "graficos": (_graficos, None),
+    "anomalias": (_anomalias, None),
+    "clustering": (_clustering, 100_000),
+    "predicciones": (_predicciones, 10_000),
+}
+
+# Esperar a que terminen los cálculos en segundo plano (árboles del clustering) para que no se
+# mezclen con la medida del siguiente caso
+def _esperar_segundo_plano():
+    agrupamiento._constructor.submit(lambda: None).result()
+
+def medir(funcion, df, repeticiones, memoria=True):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(df)
+        tiempos.append(time.perf_counter() - inicio)
+        _esperar_segundo_plano()
+    resultado = {"segundos": round(min(tiempos), 4)}
+    if memoria:
+        tracemalloc.start()
+        funcion(df)
+        resultado["pico_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+        tracemalloc.stop()
+        _esperar_segundo_plano()
+    return resultado
+
+def commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return "desconocido"
+
+def ejecutar(tamanos, casos, repeticiones, memoria=True):
+    resultados = {caso: {} for caso in casos}
+    for n in tamanos:
+        df = materializar_caracteristicas(generar_dataframe(n))
+        for caso in casos:
+            funcion, max_filas = CASOS[caso]
+            if max_filas is not None and n > max_filas:
+                continue
+            resultados[caso][str(n)] = medir(funcion, df, repeticiones, memoria)
+            print(caso, n, resultados[caso][str(n)], flush=True)
+    return {
+        "commit": commit_actual(),
+        "fecha": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "resultados": resultados,
+    }
+
+# Comparar dos ejecuciones: devuelve una fila por caso, tamaño y métrica presentes en ambas, con
+# el cociente actual / base y si supera la tolerancia (p. ej. 0.25 = un 25% peor, o la tolerancia
+# mínima del caso si es mayor) y la diferencia mínima de la métrica
+def comparar(actual, base, tolerancia):
+    filas = []
+    for caso, por_tamano in actual["resultados"].items():
+        tolerancia_caso = max(tolerancia, TOLERANCIA_MINIMA.get(caso, 0))
+        for n, metricas in por_tamano.items():
+            anterior = base["resultados"].get(caso, {}).get(n)
+            if anterior is None:
+                continue
+            for metrica, valor in metricas.items():
+                if metrica not in anterior or not anterior[metrica]:
+                    continue
+                cociente = valor / anterior[metrica]
+                filas.append({"caso": caso, "tamano": n, "metrica": metrica, "base": anterior[metrica],
+                              "actual": valor, "cociente": round(cociente, 2),
+                              "regresion": cociente > 1 + tolerancia_caso and valor - anterior[metrica] > DIFERENCIA_MINIMA.get(metrica, 0)})
+    return filas
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tamanos", type=int, nargs="+", default=TAMANOS)
+    parser.add_argument("--casos", nargs="+", choices=list(CASOS), default=list(CASOS))
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--sin-memoria", action="store_true", help="No medir el pico de memoria")
+    parser.add_argument("--salida", help="JSON de resultados (por defecto benchmarks/resultados/<commit>.json)")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior con la que comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.25)
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore")
+
+    actual = ejecutar(args.tamanos, args.casos, args.repeticiones, memoria=not args.sin_memoria)
+    salida = args.salida or os.path.join(DIRECTORIO_RESULTADOS, f"{actual['commit']}.json")
+    os.makedirs(os.path.dirname(salida) or ".", exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(actual, f, ensure_ascii=False, indent=2)
+    print(f"Resultados guardados en {salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+        filas = comparar(actual, base, args.tolerancia)
+        print(f"Comparación con {base.get('commit')} ({args.comparar}):")
+        for fila in filas:
+            print(f"{'REGRESIÓN' if fila['regresion'] else 'ok':10} {fila['caso']:13} {fila['tamano']:>8} "
+                  f"{fila['metrica']:9} {fila['base']:>10} -> {fila['actual']:>10} (x{fila['cociente']})")
+        if any(fila["regresion"] for fila in filas):
+            sys.exit(1)
@@ -1,54 +1,44 @@
 import streamlit as st
-from utils.data_manager import load_data
-import pandas as pd
-import numpy as np
-from sklearn.ensemble import IsolationForest
-import plotly.express as px
+from navigation.comun import cargar_datos
+from utils.anomalias import analizar_anomalias, deportes_con_datos
+from utils.tiempos import medir
 
-def deteccion_anomalias(df):
-    # Filtrar solo actividades de Running
-    df = df[df['Deporte'] == 'running']
-    
-    # Selección de variables relevantes
-    df["Tiempo (s)"] = df["Duración (min)"] * 60
-    df['Velocidad_Media'] = df['Distancia (m)'] / df['Tiempo (s)']
-    df = df[['Distancia (m)', 'Tiempo (s)', 'Velocidad_Media', 'Elevación Ganada (m)', 'Frecuencia Cardíaca Media']]
-    
-    # Manejo de valores nulos
-    df = df.dropna()
-    
-    # Entrenar modelo Isolation Forest
-    modelo = IsolationForest(contamination=0.05, random_state=42)
-    df['Anomalia'] = modelo.fit_predict(df)
-    
-    # Filtrar anomalías
-    anomalies = df[df['Anomalia'] == -1]
-    
-    # Crear gráfico de dispersión con plotly
-    fig = px.scatter(
-        df, 
-        x='Distancia (m)', 
-        y='Velocidad_Media', 
-        color=df['Anomalia'].map({1: "Normal", -1: "Anomalía"}),
-        color_discrete_map={"Normal": "blue", "Anomalía": "red"},
-        title="Detección de Anomalías en Running",
-        labels={"Distancia (m)": "Distancia (m)", "Velocidad_Media": "Velocidad Media (m/s)"}
+def deteccion_anomalias(df, user_id):
+    # Un detector por deporte con actividades suficientes (por defecto solo Running)
+    disponibles = deportes_con_datos(df)
+    if not disponibles:
+        st.info("No hay actividades suficientes de ningún deporte para detectar anomalías.")
+        return
+    deportes = st.multiselect(
+        "Deportes analizados (un modelo por deporte)",
+        disponibles,
+        default=['running'] if 'running' in disponibles else disponibles,
     )
-    
+    if not deportes:
+        return
+
+    # Puntuaciones de los Isolation Forest guardados: solo se puntúan las actividades nuevas y los
+    # modelos que hay que reajustar se ajustan en paralelo ('Tiempo (s)' y 'Velocidad_Media' vienen
+    # calculadas al cargar los datos)
+    resultado = analizar_anomalias(user_id, df, deportes)
+    for deporte, motivo in resultado["motivos"].items():
+        st.caption(f"Modelo de anomalías de {deporte} ajustado ({motivo}).")
+
     # Mostrar gráfico en Streamlit
-    st.plotly_chart(fig)
+    with medir("grafico.anomalias"):
+        st.plotly_chart(resultado["figura"])
     
     # Mostrar entrenamientos anómalos
     st.write("⚠️ Entrenamientos anómalos detectados:")
-    st.dataframe(anomalies)
+    st.dataframe(resultado["anomalias"])
 
 def anomalias_page(user_id):
     st.title("Detección de anomalías")
     try:
-        df = load_data(user_id)
+        df = cargar_datos(user_id)
         if df is not None:
             st.markdown("""
-                        En esta página se aplica un modelo de **detección de anomalías** utilizando el algoritmo **Isolation Forest** sobre tus actividades de **running**.  
+                        En esta página se aplica un modelo de **detección de anomalías** utilizando el algoritmo **Isolation Forest** sobre tus actividades de cada deporte (por defecto, **running**), con un modelo distinto por deporte.  
                         El objetivo es encontrar entrenamientos que se salgan de tu patrón habitual, ya sea por su duración, intensidad, velocidad o elevación.
 
                         ### ¿Cómo funciona Isolation Forest?
@@ -67,7 +57,7 @@ def anomalias_page(user_id):
 
             expander1 = st.expander("Despliega para ver la tabla de datos")
             expander1.dataframe(df)
-            deteccion_anomalias(df)
+            deteccion_anomalias(df, user_id)
         else:
             st.warning("No se han encontrado datos. Por favor, descarga los datos en la página de inicio.")
     except Exception as e:
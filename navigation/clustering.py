@@ -1,52 +1,14 @@
 import streamlit as st
-from utils.data_manager import load_data
-import pandas as pd
-import numpy as np
-from sklearn.cluster import DBSCAN
-from sklearn.preprocessing import StandardScaler
-import plotly.express as px
-
-def aplicar_clustering(df, eps=0.5, min_samples=5):
-    # Filtrar solo actividades de Running y Ciclismo
-    df = df[df['Deporte'].isin(['running', 'cycling'])]
-    
-    # Selección de variables relevantes
-    df['Tiempo (s)'] = df['Duración (min)'] * 60
-    df['Velocidad_Media'] = df['Distancia (m)'] / df['Tiempo (s)']
-    df = df[['Distancia (m)', 'Tiempo (s)', 'Velocidad_Media', 'Elevación Ganada (m)', 'Frecuencia Cardíaca Media']]
-    
-    # Manejo de valores nulos
-    df = df.dropna()
-    
-    # Normalización de los datos
-    scaler = StandardScaler()
-    df_scaled = scaler.fit_transform(df)
-    
-    # Aplicar DBSCAN
-    modelo = DBSCAN(eps=eps, min_samples=min_samples)
-    clusters = modelo.fit_predict(df_scaled)
-    df['Cluster'] = clusters
-    
-    # Crear gráfico interactivo con plotly
-    fig = px.scatter(
-        df, 
-        x='Distancia (m)', 
-        y='Velocidad_Media', 
-        color=df['Cluster'].astype(str),
-        title="Clustering de Actividades Deportivas con DBSCAN",
-        labels={"Distancia (m)": "Distancia (m)", "Velocidad_Media": "Velocidad Media (m/s)"},
-        color_discrete_sequence=px.colors.qualitative.Set1
-    )
-    
-    return df, fig
+from navigation.comun import cargar_datos
+from utils.clustering import DEPORTES_CLUSTERING, aplicar_clustering
+from utils.tiempos import medir
 
 def clustering_page(user_id):
     st.title("Clustering de Actividades con DBSCAN")
     
     try:
-        if 'df' not in st.session_state or st.button("Actualizar Datos"):
-            st.session_state.df = load_data(user_id)
-        df = st.session_state.df
+        # Solo se leen del almacén las actividades de running y ciclismo
+        df = cargar_datos(user_id, deportes=DEPORTES_CLUSTERING)
         
         if df is not None:
             st.markdown("""
@@ -80,7 +42,8 @@ def clustering_page(user_id):
             
             df_clustered, fig = aplicar_clustering(df, eps, min_samples)
             
-            st.plotly_chart(fig)
+            with medir("grafico.clustering"):
+                st.plotly_chart(fig)
             
             # Mostrar datos clusterizados
             st.write("📊 Datos clusterizados:")
@@ -0,0 +1,11 @@
+import streamlit as st
+from utils.data_manager import load_data, tiene_datos
+
+# Utilidades comunes de las páginas. Los cálculos viven en utils y no dependen de Streamlit; las
+# páginas solo cargan los datos, llaman a esas funciones y muestran sus resultados.
+
+# Cargar los datos de una página, avisando si se muestra el dataset de muestra
+def cargar_datos(user_id, **filtros):
+    if not tiene_datos(user_id):
+        st.warning('Puesto que no se han subido datos, se mostrará un archivo de muestra.', icon="⚠️")
+    return load_data(user_id, **filtros)
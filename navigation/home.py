@@ -1,66 +1,14 @@
 import streamlit as st
-import pandas as pd
 from garminconnect import Garmin
-from utils.data_manager import save_data
+from utils.data_manager import exportar_csv, resumen_actividades
+from utils.garmin_sync import sincronizar_actividades
 GARMIN_LOGO = "assets/garmin-logo-0.png"
 
-def obtener_actividades(email, password):
+def obtener_actividades(email, password, user_id, progreso=None):
     client = Garmin(email, password)
     client.login()
-    activities = client.get_activities(0, 5000)
-
-    activity_data = []
-    for act in activities:
-        sport = act["activityType"]["typeKey"]
-        cadence = act.get("averageRunningCadenceInStepsPerMinute") if sport == "running" else act.get("averageBikeCadence")
-        max_cadence = act.get("maxRunningCadenceInStepsPerMinute") if sport == "running" else act.get("maxBikeCadence")
-        
-        lat = act.get("startLatitude")
-        lon = act.get("startLongitude")
-        elevation_gain = act.get("elevationGain")
-        elevation_loss = act.get("elevationLoss")
-        temperature = act.get("temperature")
-
-        hr_zones = ["hrTimeInZone_1", "hrTimeInZone_2", "hrTimeInZone_3", "hrTimeInZone_4", "hrTimeInZone_5"]
-        time_in_zones = {zone: act.get(zone, 0) for zone in hr_zones}
-        
-        distance = act.get("distance")
-        duration = act.get("duration")
-        avg_pace = (duration / 60) / (distance / 1000) if distance and duration else None
-
-        activity_data.append({
-            "Activity ID": act["activityId"],
-            "Nombre de la Actividad": act.get("activityName"),
-            "Fecha de Inicio": act.get("startTimeLocal"),
-            "Deporte": sport,
-            "Duración (min)": duration / 60 if duration else None,
-            "Distancia (m)": distance,
-            "Ritmo medio (min/km)": avg_pace,
-            "Velocidad media (m/s)": act.get("averageSpeed"),
-            "Velocidad máxima (m/s)": act.get("maxSpeed"),
-            "Calorías": act.get("calories"),
-            "Tasa Metabólica Basal": act.get("bmrCalories"),
-            "Frecuencia Cardíaca Media": act.get("averageHR"),
-            "Frecuencia Cardíaca Máxima": act.get("maxHR"),
-            "Tiempo en Zona 1 (s)": time_in_zones["hrTimeInZone_1"],
-            "Tiempo en Zona 2 (s)": time_in_zones["hrTimeInZone_2"],
-            "Tiempo en Zona 3 (s)": time_in_zones["hrTimeInZone_3"],
-            "Tiempo en Zona 4 (s)": time_in_zones["hrTimeInZone_4"],
-            "Tiempo en Zona 5 (s)": time_in_zones["hrTimeInZone_5"],
-            "VO2Max": act.get("vO2MaxValue"),
-            "Cadencia Media (spm)": cadence,
-            "Cadencia Máxima (spm)": max_cadence,
-            "Elevación Ganada (m)": elevation_gain,
-            "Elevación Perdida (m)": elevation_loss,
-            "Potencia Media (W)": act.get("averagePower"),
-            "Potencia Máxima (W)": act.get("maxPower"),
-            "Temperatura (°C)": temperature,
-            "Latitud": lat,
-            "Longitud": lon,
-            "Lugar": act.get("locationName")
-        })
-    
-    return pd.DataFrame(activity_data)
+    # Solo se descargan las actividades que aún no están guardadas
+    return sincronizar_actividades(client, user_id, progreso=progreso)
 
 def home_page(user_id):
     # st.image(GARMIN_LOGO)
@@ -75,10 +23,14 @@ def home_page(user_id):
     if st.button("Descargar Datos"):
         if email and password:
             try:
-                df = obtener_actividades(email, password)
-                save_data(df, user_id)
+                barra = st.progress(0.0, text="Conectando con Garmin...")
+                progreso = lambda descargadas, fraccion: barra.progress(fraccion, text=f"{descargadas} actividades descargadas")
+                df, nuevas = obtener_actividades(email, password, user_id, progreso=progreso)
                 st.write(df)
-                st.success("Datos descargados correctamente")
+                st.success(f"Datos descargados correctamente ({nuevas} actividades nuevas)")
+                # Resumen por deporte calculado directamente en el almacén
+                st.dataframe(resumen_actividades(user_id), hide_index=True)
+                st.download_button("Exportar a CSV", exportar_csv(user_id), file_name="actividades.csv", mime="text/csv")
             except Exception as e:
                 st.error(f"Ocurrió un error: {e}")
         else:
@@ -0,0 +1,105 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from sklearn.cluster import DBSCAN, HDBSCAN
+from sklearn.neighbors import NearestNeighbors
+
+# Motor de DBSCAN interactivo.
+# Para cada versión de los datos (matriz ya escalada) se calculan una vez los vecinos más cercanos
+# de cada punto y, para cada min_samples, el árbol de single linkage sobre la distancia de
+# alcanzabilidad mutua (el que construye HDBSCAN). Cortar ese árbol a una altura eps da los
+# mismos grupos de puntos núcleo que DBSCAN(eps, min_samples), y los puntos frontera se asignan
+# al núcleo más cercano a menos de eps usando los vecinos precalculados. Así cualquier par
+# (eps, min_samples) se obtiene en tiempo casi lineal, sin volver a ejecutar DBSCAN.
+
+# Mayor min_samples para el que se precalculan vecinos (el máximo del slider de la página)
+MAX_MIN_SAMPLES = 10
+
+# Número de versiones de datos que se mantienen en memoria
+MAX_VERSIONES = 4
+
+_versiones = OrderedDict()  # huella -> {"X", "distancias", "vecinos", "arboles", "pendientes"}
+_lock = threading.Lock()
+
+# Los árboles se construyen en segundo plano, de uno en uno para todo el proceso
+_constructor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="agrupamiento")
+
+def _huella(X):
+    h = hashlib.sha1(np.ascontiguousarray(X).tobytes())
+    h.update(str(X.shape).encode("utf-8"))
+    return h.hexdigest()
+
+# Datos precalculados de una matriz (los vecinos se calculan la primera vez que se pide)
+def _version(X):
+    clave = _huella(X)
+    with _lock:
+        version = _versiones.get(clave)
+        if version is not None:
+            _versiones.move_to_end(clave)
+            return version
+
+    k = min(MAX_MIN_SAMPLES, len(X))
+    distancias, vecinos = NearestNeighbors(n_neighbors=k).fit(X).kneighbors(X)
+    version = {"X": X, "distancias": distancias, "vecinos": vecinos, "arboles": {}, "pendientes": set()}
+    with _lock:
+        version = _versiones.setdefault(clave, version)
+        _versiones.move_to_end(clave)
+        while len(_versiones) > MAX_VERSIONES:
+            _versiones.popitem(last=False)
+    return version
+
+def _construir_arbol(version, min_samples):
+    arbol = HDBSCAN(min_samples=min_samples, min_cluster_size=2).fit(version["X"])
+    with _lock:
+        version["arboles"][min_samples] = arbol
+        version["pendientes"].discard(min_samples)
+
+# Encargar en segundo plano los árboles que falten, empezando por el min_samples pedido
+def _encargar_arboles(version, min_samples):
+    orden = [min_samples] + [m for m in range(2, version["distancias"].shape[1] + 1) if m != min_samples]
+    with _lock:
+        faltan = [m for m in orden if m not in version["arboles"] and m not in version["pendientes"]]
+        version["pendientes"].update(faltan)
+    for m in faltan:
+        _constructor.submit(_construir_arbol, version, m)
+
+# Numerar los grupos por orden de aparición de su primer punto núcleo, igual que DBSCAN (-1 es ruido)
+def _renumerar(etiquetas, nucleo):
+    if not nucleo.any():
+        return etiquetas
+    valores, primera = np.unique(etiquetas[nucleo], return_index=True)
+    nuevas = np.empty(len(valores), dtype=etiquetas.dtype)
+    nuevas[np.argsort(primera)] = np.arange(len(valores))
+    grupos = etiquetas >= 0
+    resultado = np.full(len(etiquetas), -1, dtype=etiquetas.dtype)
+    resultado[grupos] = nuevas[np.searchsorted(valores, etiquetas[grupos])]
+    return resultado
+
+# Etiquetas de DBSCAN(eps, min_samples) para la matriz `X` (ya escalada).
+# Si el árbol de ese min_samples todavía no está construido se ejecuta DBSCAN directamente y el
+# árbol se construye en segundo plano para los siguientes valores de los sliders.
+def etiquetas_dbscan(X, eps, min_samples):
+    X = np.asarray(X, dtype=float)
+    if len(X) == 0:
+        return np.empty(0, dtype=np.intp)
+    version = _version(X)
+    distancias, vecinos = version["distancias"], version["vecinos"]
+    with _lock:
+        arbol = version["arboles"].get(min_samples)
+    if arbol is None or min_samples > distancias.shape[1]:
+        if min_samples <= distancias.shape[1]:
+            _encargar_arboles(version, min_samples)
+        return DBSCAN(eps=eps, min_samples=min_samples).fit_predict(X)
+
+    # Puntos núcleo: tienen al menos min_samples puntos (incluido él mismo) a distancia <= eps
+    nucleo = distancias[:, min_samples - 1] <= eps
+    etiquetas = np.where(nucleo, arbol.dbscan_clustering(eps, min_cluster_size=1), -1)
+
+    # Puntos frontera: el núcleo más cercano a distancia <= eps. Un punto que no es núcleo tiene
+    # menos de min_samples puntos a esa distancia, así que todos están entre sus vecinos precalculados.
+    alcanzables = (distancias <= eps) & nucleo[vecinos]
+    frontera = ~nucleo & alcanzables.any(axis=1)
+    etiquetas[frontera] = etiquetas[vecinos[frontera, alcanzables[frontera].argmax(axis=1)]]
+    return _renumerar(etiquetas, nucleo)
@@ -0,0 +1,211 @@
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+# Almacén de los datos de usuario en una base de datos SQLite embebida.
+# Todas las tablas por usuario (actividades, descarga en curso, carga y puntuaciones de anomalías)
+# viven en un único archivo, con el user_id como primera columna de la clave. La tabla de usuarios
+# guarda el último uso y la versión de los datos de cada uno, y el resto de tablas cuelgan de ella
+# con ON DELETE CASCADE: eliminar los datos de un usuario (o de todos los caducados) es un único
+# DELETE. Las columnas de cada tabla se crean a partir del primer DataFrame que se guarda en ella
+# (y se añaden si aparecen columnas nuevas); las fechas se guardan como texto ISO, de modo que los
+# filtros por rango de fechas usan los índices.
+
+RUTA = os.environ.get("GARMIN_DB", os.path.join("data", "garmin.db"))
+
+# Clave (además del user_id) e índices de cada tabla
+TABLAS = {
+    "actividades": {"clave": ["Activity ID"], "indices": [["Fecha de Inicio"], ["Deporte", "Fecha de Inicio"]]},
+    "descargas": {"clave": [], "indices": []},
+    "carga": {"clave": ["Fecha"], "indices": []},
+    "anomalias": {"clave": [], "indices": [["Deporte"]]},
+}
+
+FORMATO_FECHA = "%Y-%m-%d %H:%M:%S"
+
+_local = threading.local()
+_lock = threading.Lock()
+_columnas = {}  # (ruta, tabla) -> columnas ya creadas
+
+# sqlite3 solo sabe guardar los tipos de Python
+sqlite3.register_adapter(np.int64, int)
+sqlite3.register_adapter(np.int32, int)
+sqlite3.register_adapter(np.bool_, bool)
+
+def _citar(nombre):
+    return '"' + nombre.replace('"', '""') + '"'
+
+# Conexión del hilo actual (sqlite3 no permite compartir conexiones entre hilos)
+def conexion():
+    con = getattr(_local, "conexion", None)
+    if con is None or getattr(_local, "ruta", None) != RUTA:
+        os.makedirs(os.path.dirname(RUTA) or ".", exist_ok=True)
+        con = sqlite3.connect(RUTA, timeout=30, isolation_level=None)
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA foreign_keys=ON")
+        con.execute("""CREATE TABLE IF NOT EXISTS usuarios (
+            user_id TEXT PRIMARY KEY, ultimo_uso REAL NOT NULL, version INTEGER)""")
+        _local.conexion, _local.ruta = con, RUTA
+    return con
+
+# Crear la tabla (o añadirle las columnas que le falten) para guardar `columnas`
+def _preparar_tabla(con, tabla, columnas):
+    with _lock:
+        existentes = _columnas.get((RUTA, tabla))
+    if existentes is None:
+        existentes = {fila[1] for fila in con.execute(f"PRAGMA table_info({_citar(tabla)})")}
+    if not existentes:
+        clave = ", ".join(_citar(c) for c in ["user_id"] + TABLAS[tabla]["clave"])
+        definicion = ", ".join(_citar(c) for c in columnas if c != "user_id")
+        con.execute(f"""CREATE TABLE IF NOT EXISTS {_citar(tabla)} (
+            user_id TEXT NOT NULL REFERENCES usuarios(user_id) ON DELETE CASCADE,
+            {definicion}{f", PRIMARY KEY ({clave})" if TABLAS[tabla]["clave"] else ""})""")
+        if not TABLAS[tabla]["clave"]:
+            con.execute(f"CREATE INDEX IF NOT EXISTS {_citar(f'{tabla}_usuario')} ON {_citar(tabla)} (user_id)")
+        for indice in TABLAS[tabla]["indices"]:
+            nombre = _citar(f"{tabla}_{'_'.join(indice)}")
+            con.execute(f"CREATE INDEX IF NOT EXISTS {nombre} ON {_citar(tabla)} "
+                        f"(user_id, {', '.join(_citar(c) for c in indice)})")
+        existentes = {"user_id", *columnas}
+    for columna in columnas:
+        if columna not in existentes:
+            con.execute(f"ALTER TABLE {_citar(tabla)} ADD COLUMN {_citar(columna)}")
+            existentes = existentes | {columna}
+    with _lock:
+        _columnas[(RUTA, tabla)] = existentes
+
+def _existe_tabla(con, tabla):
+    with _lock:
+        if _columnas.get((RUTA, tabla)):
+            return True
+    return con.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (tabla,)).fetchone() is not None
+
+# Columnas de una tabla (sin el user_id); lista vacía si la tabla no existe
+def columnas(tabla):
+    con = conexion()
+    return [fila[1] for fila in con.execute(f"PRAGMA table_info({_citar(tabla)})") if fila[1] != "user_id"]
+
+# Filas de un DataFrame listas para sqlite3: fechas como texto ISO y valores ausentes como NULL
+def _filas(df):
+    df = df.assign(**{col: df[col].dt.strftime(FORMATO_FECHA) for col in df.columns
+                      if pd.api.types.is_datetime64_any_dtype(df[col])})
+    df = df.astype(object)
+    return df.where(df.notna(), None).itertuples(index=False, name=None)
+
+# Registrar el uso de un usuario (lo crea si no existe). Con `version=True` se marca que sus
+# actividades han cambiado; la versión es el instante de la escritura, así que no se repite aunque
+# el usuario se elimine y vuelva a crearse.
+def _tocar(con, user_id, version=False):
+    nueva = time.time_ns() if version else None
+    con.execute("""INSERT INTO usuarios (user_id, ultimo_uso, version) VALUES (?, ?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET ultimo_uso = MAX(ultimo_uso, excluded.ultimo_uso),
+        version = COALESCE(excluded.version, version)""", (user_id, time.time(), nueva))
+
+# Parte WHERE y parámetros de las filas de un usuario que cumplen `condiciones`, una lista de
+# (fragmento SQL, parámetros)
+def _donde(user_id, condiciones):
+    donde = " AND ".join(["user_id = ?"] + [f"({sql})" for sql, _ in condiciones])
+    return donde, [user_id] + [p for _, ps in condiciones for p in ps]
+
+# Escribir las filas de `df` de un usuario en una tabla (en una sola transacción). Con
+# `sustituir` se eliminan antes las filas que ya tenía (solo las que cumplen `condiciones`, si se
+# indican).
+def _escribir(tabla, user_id, df, sustituir, condiciones=()):
+    con = conexion()
+    columnas = [str(c) for c in df.columns]
+    _preparar_tabla(con, tabla, columnas)
+    sql = (f"INSERT OR REPLACE INTO {_citar(tabla)} (user_id, {', '.join(_citar(c) for c in columnas)}) "
+           f"VALUES (?{', ?' * len(columnas)})")
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        _tocar(con, user_id, version=tabla == "actividades")
+        if sustituir:
+            donde, parametros = _donde(user_id, condiciones)
+            con.execute(f"DELETE FROM {_citar(tabla)} WHERE {donde}", parametros)
+        con.executemany(sql, ((user_id, *fila) for fila in _filas(df)))
+        con.execute("COMMIT")
+    except BaseException:
+        con.execute("ROLLBACK")
+        raise
+
+# Sustituir las filas de un usuario en una tabla por las de `df`: todas o, si se indican
+# `condiciones` (como en `leer`), solo las que las cumplen (p. ej. los días desde una fecha)
+def reemplazar(tabla, user_id, df, condiciones=()):
+    _escribir(tabla, user_id, df, sustituir=True, condiciones=condiciones)
+
+# Añadir las filas de `df` a las que ya tiene un usuario en una tabla (p. ej. una página más de
+# una descarga), sin reescribir las anteriores
+def añadir(tabla, user_id, df):
+    _escribir(tabla, user_id, df, sustituir=False)
+
+# Eliminar las filas de un usuario de una tabla
+def borrar(tabla, user_id):
+    con = conexion()
+    if _existe_tabla(con, tabla):
+        con.execute(f"DELETE FROM {_citar(tabla)} WHERE user_id = ?", (user_id,))
+
+# Eliminar un usuario y, en cascada, todos sus datos
+def eliminar_usuario(user_id):
+    conexion().execute("DELETE FROM usuarios WHERE user_id = ?", (user_id,))
+
+# Leer las filas de un usuario de una tabla, en el orden en que se guardaron (o por `orden`, un
+# fragmento SQL como '"Fecha" DESC', y como mucho `limite` filas). `condiciones` es una lista de
+# (fragmento SQL, parámetros) que se añaden al WHERE, y `tipos` ({columna: dtype}) los tipos con
+# los que se devuelven las columnas (SQLite no los conserva). Devuelve None si el usuario no tiene
+# filas en la tabla.
+def leer(tabla, user_id, columnas=None, condiciones=(), tipos=None, orden=None, limite=None):
+    con = conexion()
+    if not _existe_tabla(con, tabla):
+        return None
+    seleccion = ", ".join(_citar(c) for c in columnas) if columnas is not None else "*"
+    donde, parametros = _donde(user_id, condiciones)
+    sql = f"SELECT {seleccion} FROM {_citar(tabla)} WHERE {donde} ORDER BY {orden or 'rowid'}"
+    if limite is not None:
+        sql += f" LIMIT {int(limite)}"
+    df = pd.read_sql_query(sql, con, params=parametros)
+    if df.empty and not con.execute(f"SELECT 1 FROM {_citar(tabla)} WHERE user_id = ? LIMIT 1", (user_id,)).fetchone():
+        return None
+    df = df.drop(columns="user_id", errors="ignore")
+    for col, tipo in (tipos or {}).items():
+        if col not in df.columns:
+            continue
+        if pd.api.types.is_datetime64_any_dtype(tipo):
+            df[col] = pd.to_datetime(df[col], format=FORMATO_FECHA, errors="coerce")
+        else:
+            df[col] = df[col].astype(tipo)
+    return df
+
+# Ejecutar una consulta de lectura (p. ej. una agregación) y devolver el resultado como DataFrame
+def consultar(sql, parametros=()):
+    return pd.read_sql_query(sql, conexion(), params=list(parametros))
+
+# Versión de los datos de un usuario (cambia cada vez que se guardan sus actividades); None si
+# no tiene datos
+def version(user_id):
+    fila = conexion().execute("SELECT version FROM usuarios WHERE user_id = ?", (user_id,)).fetchone()
+    return fila[0] if fila is not None else None
+
+# Último uso de cada usuario guardado
+def ultimos_usos():
+    return dict(conexion().execute("SELECT user_id, ultimo_uso FROM usuarios").fetchall())
+
+# Guardar el último uso de varios usuarios ({user_id: instante}) y eliminar en la misma transacción
+# los que no se usan desde `limite` (salvo los protegidos). Devuelve los usuarios eliminados.
+def caducar(usos, limite, protegidos=()):
+    con = conexion()
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        con.executemany("UPDATE usuarios SET ultimo_uso = MAX(ultimo_uso, ?) WHERE user_id = ?",
+                        [(uso, user_id) for user_id, uso in usos.items()])
+        protegidos = list(protegidos)
+        eliminados = [fila[0] for fila in con.execute(
+            f"DELETE FROM usuarios WHERE ultimo_uso < ? AND user_id NOT IN ({', '.join('?' * len(protegidos)) or 'NULL'}) "
+            "RETURNING user_id", [limite, *protegidos])]
+        con.execute("COMMIT")
+    except BaseException:
+        con.execute("ROLLBACK")
+        raise
+    return eliminados
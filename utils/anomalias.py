@@ -0,0 +1,275 @@
+import time
+import numpy as np
+import pandas as pd
+import plotly.express as px
+from sklearn.ensemble import IsolationForest
+from utils import almacen
+from utils import modelos as almacen_modelos
+from utils.data_manager import propietario_datos, tiene_datos
+from utils.entrenamiento import MAX_WORKERS_PROCESO, ejecutar_tareas
+from utils.renderizado import modo_render
+from utils.tiempos import cronometrado
+
+# Detección de anomalías persistente y por deporte.
+# Cada deporte con suficientes actividades tiene su propio Isolation Forest, con sus propias
+# variables; los que hay que ajustar se ajustan a la vez en el pool de procesos del entrenamiento.
+# El modelo de cada usuario y deporte se guarda en el almacén de modelos (con la huella
+# de los datos con los que se ajustó) y la puntuación de cada actividad se guarda por usuario.
+# Al volver a la página solo se puntúan las actividades que todavía no tienen puntuación; el modelo
+# se reajusta con todo el historial cuando es antiguo, cuando las actividades puntuadas después del
+# ajuste ya son muchas o cuando entre las nuevas aparecen demasiadas anomalías (deriva).
+
+COLUMNAS_ANOMALIAS = ['Distancia (m)', 'Tiempo (s)', 'Velocidad_Media', 'Elevación Ganada (m)', 'Frecuencia Cardíaca Media']
+
+# Variables de cada deporte (sin elevación en cinta ni en piscina); el resto de deportes usa
+# COLUMNAS_SIN_DISTANCIA
+COLUMNAS_DEPORTE = {
+    "running": COLUMNAS_ANOMALIAS,
+    "trail_running": COLUMNAS_ANOMALIAS,
+    "treadmill_running": ['Distancia (m)', 'Tiempo (s)', 'Velocidad_Media', 'Frecuencia Cardíaca Media'],
+    "cycling": COLUMNAS_ANOMALIAS,
+    "road_biking": COLUMNAS_ANOMALIAS,
+    "mountain_biking": COLUMNAS_ANOMALIAS,
+    "indoor_cycling": ['Tiempo (s)', 'Frecuencia Cardíaca Media', 'Calorías'],
+    "lap_swimming": ['Distancia (m)', 'Tiempo (s)', 'Velocidad_Media', 'Frecuencia Cardíaca Media'],
+    "open_water_swimming": ['Distancia (m)', 'Tiempo (s)', 'Velocidad_Media', 'Frecuencia Cardíaca Media'],
+    "walking": COLUMNAS_ANOMALIAS,
+    "hiking": COLUMNAS_ANOMALIAS,
+}
+COLUMNAS_SIN_DISTANCIA = ['Tiempo (s)', 'Frecuencia Cardíaca Media', 'Calorías']
+
+# Actividades con datos completos necesarias para entrenar el detector de un deporte
+MIN_ACTIVIDADES_DEPORTE = 20
+
+CONTAMINACION = 0.05
+
+# Reajustar el modelo si tiene más de estos días
+REENTRENO_DIAS = 7
+
+# Reajustar si las actividades puntuadas después del ajuste superan esta fracción de las de ajuste
+FRACCION_REENTRENO = 0.25
+
+# Reajustar si, con al menos MIN_NUEVAS_DERIVA actividades nuevas, la fracción de anomalías entre
+# ellas supera UMBRAL_DERIVA veces la contaminación esperada
+MIN_NUEVAS_DERIVA = 10
+UMBRAL_DERIVA = 3
+
+# Columnas de las puntuaciones guardadas
+COLUMNAS_PUNTUACIONES = ["Activity ID", "Deporte", "Puntuación", "Anomalia", "Modelo", "Entrenado", "Origen"]
+
+# Origen de la puntuación de cada actividad
+ORIGEN_AJUSTE = "ajuste"
+ORIGEN_INCREMENTAL = "incremental"
+
+# Tipos de las columnas numéricas de las puntuaciones guardadas en el almacén
+TIPOS_PUNTUACIONES = {"Activity ID": "int64", "Puntuación": "float64", "Anomalia": "int64", "Entrenado": "float64"}
+
+# Variables del detector de un deporte
+def columnas_deporte(deporte):
+    return COLUMNAS_DEPORTE.get(deporte, COLUMNAS_SIN_DISTANCIA)
+
+# Configuración del detector (forma parte de la clave del modelo en el almacén)
+def configuracion_anomalias(deporte):
+    return {
+        "tipo": "anomalias",
+        "deporte": deporte,
+        "columnas": columnas_deporte(deporte),
+        "contamination": CONTAMINACION,
+        "random_state": 42,
+    }
+
+# Variables del detector y Activity ID de las actividades de un deporte con datos completos
+def datos_deporte(df, deporte):
+    datos = df[df['Deporte'] == deporte]
+    columnas = columnas_deporte(deporte)
+    completas = datos[columnas].notna().all(axis=1)
+    X = datos.loc[completas, columnas]
+    ids = datos.loc[completas, 'Activity ID'].to_numpy(dtype="int64", na_value=-1)
+    return ids, X
+
+# Deportes con actividades suficientes para entrenar su detector, del más al menos frecuente
+def deportes_con_datos(df, minimo=MIN_ACTIVIDADES_DEPORTE):
+    completas = {deporte: len(datos_deporte(df, deporte)[1]) for deporte in df['Deporte'].dropna().unique()}
+    return [deporte for deporte, n in sorted(completas.items(), key=lambda x: -x[1]) if n >= minimo]
+
+def _ajustar_isolation_forest(X):
+    return IsolationForest(contamination=CONTAMINACION, random_state=42).fit(X)
+
+# Ajustar (o recuperar del almacén si ya se ajustaron con los mismos datos) los detectores de
+# varios deportes. `datos` es {deporte: X}. Los que no están en el almacén se ajustan en paralelo
+# en el pool de procesos (si solo hay uno, o el pool tiene un único worker, se ajustan en este
+# proceso para ahorrarse el envío de datos).
+# Los modelos se guardan a nombre de `propietario`.
+# Devuelve {deporte: (clave del modelo, modelo, si se ha ajustado ahora)}.
+def ajustar_detectores(datos, propietario=None):
+    claves = {deporte: almacen_modelos.huella(X, configuracion_anomalias(deporte), propietario) for deporte, X in datos.items()}
+    detectores = {}
+    pendientes = {}
+    for deporte, clave in claves.items():
+        modelo = almacen_modelos.cargar_modelo(clave)
+        if modelo is not None:
+            detectores[deporte] = (clave, modelo, False)
+        else:
+            pendientes[deporte] = (_ajustar_isolation_forest, (datos[deporte],))
+
+    def al_terminar(deporte, modelo):
+        almacen_modelos.guardar_modelo(claves[deporte], modelo, {
+            "tipo": "anomalias",
+            "deporte": deporte,
+            "n_registros": len(datos[deporte]),
+        }, propietario)
+        detectores[deporte] = (claves[deporte], modelo, True)
+
+    if len(pendientes) == 1 or MAX_WORKERS_PROCESO == 1:
+        for deporte, (funcion, args) in pendientes.items():
+            al_terminar(deporte, funcion(*args))
+    elif pendientes:
+        ejecutar_tareas(pendientes, al_terminar)
+    return detectores
+
+# Ajustar (o recuperar del almacén) el detector de un deporte
+def ajustar_detector(X, deporte, propietario=None):
+    return ajustar_detectores({deporte: X}, propietario)[deporte]
+
+# Puntuación de anomalía (mayor cuanto más anómala) y etiqueta (-1 anomalía, 1 normal) de cada actividad
+def puntuar(modelo, X, ids, deporte, clave, entrenado, origen):
+    if len(X) == 0:
+        return pd.DataFrame(columns=COLUMNAS_PUNTUACIONES)
+    puntuacion = modelo.score_samples(X)
+    return pd.DataFrame({
+        "Activity ID": ids,
+        "Deporte": deporte,
+        "Puntuación": -puntuacion,
+        "Anomalia": np.where(puntuacion - modelo.offset_ < 0, -1, 1),
+        "Modelo": clave,
+        "Entrenado": entrenado,
+        "Origen": origen,
+    })
+
+# Motivo para reajustar el modelo antes de puntuar las actividades nuevas (None si no hace falta)
+def _motivo_reajuste(actuales, nuevas):
+    if time.time() - actuales["Entrenado"].iloc[0] > REENTRENO_DIAS * 86400:
+        return "modelo antiguo"
+    n_ajuste = (actuales["Origen"] == ORIGEN_AJUSTE).sum()
+    n_incrementales = (actuales["Origen"] == ORIGEN_INCREMENTAL).sum() + len(nuevas)
+    if n_incrementales > FRACCION_REENTRENO * n_ajuste:
+        return "muchas actividades nuevas"
+    if len(nuevas) >= MIN_NUEVAS_DERIVA and (nuevas["Anomalia"] == -1).mean() > UMBRAL_DERIVA * CONTAMINACION:
+        return "deriva en las actividades nuevas"
+    return None
+
+# Puntuaciones de un deporte a partir de las guardadas, puntuando solo las actividades nuevas.
+# Devuelve (puntuaciones, motivo); las puntuaciones son None si hay que ajustar el modelo por
+# `motivo`, y son las mismas `actuales` si no ha cambiado nada. El modelo solo se lee del almacén
+# si hay actividades nuevas que puntuar.
+def _puntuar_incremental(ids, X, deporte, actuales):
+    if len(X) == 0:
+        return puntuar(None, X, ids, deporte, None, None, None), None
+    if actuales is None or actuales.empty:
+        return None, "sin modelo guardado"
+
+    # Descartar las actividades eliminadas y puntuar solo las que no tienen puntuación
+    conocidas = actuales["Activity ID"].isin(ids)
+    nuevas = ~np.isin(ids, actuales["Activity ID"].to_numpy())
+    if conocidas.all() and not nuevas.any():
+        return actuales, None
+    actuales = actuales[conocidas].reset_index(drop=True)
+    if actuales.empty:
+        return None, "sin actividades puntuadas"
+    if not nuevas.any():
+        return actuales, None
+    modelo = almacen_modelos.cargar_modelo(actuales["Modelo"].iloc[0])
+    if modelo is None:
+        return None, "sin modelo guardado"
+    puntuadas = puntuar(modelo, X[nuevas], ids[nuevas], deporte, actuales["Modelo"].iloc[0],
+                        actuales["Entrenado"].iloc[0], ORIGEN_INCREMENTAL)
+    motivo = _motivo_reajuste(actuales, puntuadas)
+    return (None, motivo) if motivo else (pd.concat([actuales, puntuadas], ignore_index=True), None)
+
+# Puntuaciones de anomalía de las actividades de varios deportes de un usuario (por defecto, los
+# que tienen actividades suficientes), ordenadas de la más a la menos anómala, y motivo del ajuste
+# del modelo de cada deporte ({deporte: motivo}, solo los que se han ajustado ahora).
+# Solo se puntúan las actividades sin puntuación guardada y los modelos que hay que ajustar se
+# ajustan en paralelo. Con `guardar=False` no se leen ni se escriben las puntuaciones en el almacén.
+@cronometrado()
+def puntuar_deportes(user_id, df, deportes=None, guardar=True):
+    if deportes is None:
+        deportes = deportes_con_datos(df)
+    guardadas = almacen.leer("anomalias", user_id, tipos=TIPOS_PUNTUACIONES) if guardar else None
+
+    resultados = {}
+    motivos = {}
+    pendientes = {}
+    datos = {}
+    cambios = guardadas is None
+    for deporte in deportes:
+        ids, X = datos_deporte(df, deporte)
+        datos[deporte] = (ids, X)
+        actuales = guardadas[guardadas["Deporte"] == deporte] if guardadas is not None else None
+        resultados[deporte], motivos[deporte] = _puntuar_incremental(ids, X, deporte, actuales)
+        if resultados[deporte] is None:
+            pendientes[deporte] = X
+        cambios = cambios or resultados[deporte] is not actuales
+
+    for deporte, (clave, modelo, ajustado) in ajustar_detectores(pendientes, propietario_datos(user_id)).items():
+        ids, X = datos[deporte]
+        # Los modelos recuperados del almacén conservan el instante en que se ajustaron, para que
+        # REENTRENO_DIAS cuente desde el ajuste y no desde la última vez que se puntuó
+        entrenado = time.time() if ajustado else almacen_modelos.creado_modelo(clave) or time.time()
+        resultados[deporte] = puntuar(modelo, X, ids, deporte, clave, entrenado, ORIGEN_AJUSTE)
+        if not ajustado:
+            motivos[deporte] = None
+
+    partes = [r for r in resultados.values() if len(r)]
+    resultado = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=COLUMNAS_PUNTUACIONES)
+    if guardar and cambios:
+        otras = guardadas[~guardadas["Deporte"].isin(deportes)] if guardadas is not None else None
+        almacen.reemplazar("anomalias", user_id, resultado if otras is None or otras.empty else pd.concat([otras, resultado], ignore_index=True))
+    resultado = resultado.sort_values("Puntuación", ascending=False, kind="stable").reset_index(drop=True)
+    return resultado, {deporte: motivo for deporte, motivo in motivos.items() if motivo}
+
+# Puntuaciones de anomalía de las actividades de un solo deporte y motivo del ajuste de su modelo
+# (None si no se ha ajustado ahora)
+def puntuar_actividades(user_id, df, deporte="running", guardar=True):
+    resultado, motivos = puntuar_deportes(user_id, df, [deporte], guardar)
+    return resultado, motivos.get(deporte)
+
+# Puntuaciones de anomalía para mostrarlas. Solo se guardan si el usuario tiene datos propios
+# (para la muestra compartida solo se reutilizan los modelos del almacén).
+def obtener_anomalias(user_id, df, deportes=None):
+    return puntuar_deportes(user_id, df, deportes, guardar=tiene_datos(user_id))
+
+# Actividades puntuadas con las variables de sus detectores, de la más a la menos anómala
+def tabla_anomalias(puntuaciones, df, deportes):
+    columnas = list(dict.fromkeys(c for deporte in deportes for c in columnas_deporte(deporte)))
+    return puntuaciones[['Activity ID', 'Puntuación', 'Anomalia']].merge(
+        df[['Activity ID', 'Deporte', 'Fecha de Inicio', 'Nombre de la Actividad'] + columnas], on='Activity ID'
+    )
+
+# Gráfico de dispersión de las actividades puntuadas, con las anomalías en rojo y un símbolo por deporte
+@cronometrado()
+def figura_anomalias(tabla):
+    return px.scatter(
+        tabla, 
+        x='Distancia (m)' if 'Distancia (m)' in tabla else 'Tiempo (s)', 
+        y='Velocidad_Media' if 'Velocidad_Media' in tabla else 'Frecuencia Cardíaca Media', 
+        color=tabla['Anomalia'].map({1: "Normal", -1: "Anomalía"}),
+        symbol='Deporte',
+        color_discrete_map={"Normal": "blue", "Anomalía": "red"},
+        hover_data=['Fecha de Inicio', 'Puntuación'],
+        title="Detección de Anomalías por deporte",
+        labels={"Distancia (m)": "Distancia (m)", "Velocidad_Media": "Velocidad Media (m/s)"},
+        render_mode=modo_render(len(tabla))
+    )
+
+# Datos de la página de anomalías: actividades puntuadas, las anómalas, su gráfico y el motivo del
+# ajuste de los modelos que se han ajustado ahora ({deporte: motivo})
+def analizar_anomalias(user_id, df, deportes):
+    puntuaciones, motivos = obtener_anomalias(user_id, df, deportes)
+    tabla = tabla_anomalias(puntuaciones, df, deportes)
+    return {
+        "tabla": tabla,
+        "anomalias": tabla[tabla['Anomalia'] == -1],
+        "figura": figura_anomalias(tabla),
+        "motivos": motivos,
+    }
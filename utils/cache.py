@@ -0,0 +1,61 @@
+import os
+import threading
+from collections import OrderedDict
+
+# Caché en proceso de los datasets, compartida por todas las sesiones y páginas.
+# Cada entrada se identifica por una clave (user_id, consulta) y la versión de los datos del
+# usuario en el almacén, de modo que cualquier escritura nueva invalida las entradas anteriores.
+
+# Límite de memoria de la caché (MB), configurable por variable de entorno
+LIMITE_MEMORIA_MB = int(os.environ.get("GARMIN_CACHE_MB", "512"))
+
+_entradas = OrderedDict()  # (user_id, consulta) -> (version, df, bytes)
+_memoria_usada = 0
+_lock = threading.Lock()
+
+# Tamaño aproximado en memoria de un DataFrame
+def _tamano(df):
+    return int(df.memory_usage(deep=True).sum())
+
+# Obtener un dataset de la caché o cargarlo con `cargar()` si no está o su versión ha cambiado
+def obtener(clave, version, cargar):
+    global _memoria_usada
+    with _lock:
+        entrada = _entradas.get(clave)
+        if entrada is not None and entrada[0] == version:
+            _entradas.move_to_end(clave)
+            return entrada[1]
+
+    # La carga se hace fuera del lock para no bloquear al resto de sesiones
+    df = cargar()
+    tamano = _tamano(df)
+
+    with _lock:
+        anterior = _entradas.pop(clave, None)
+        if anterior is not None:
+            _memoria_usada -= anterior[2]
+        # Un dataset mayor que el límite completo no se cachea
+        if tamano <= LIMITE_MEMORIA_MB * 1024 * 1024:
+            _entradas[clave] = (version, df, tamano)
+            _memoria_usada += tamano
+            _desalojar()
+    return df
+
+# Eliminar las entradas menos usadas recientemente hasta respetar el límite de memoria
+def _desalojar():
+    global _memoria_usada
+    while _entradas and _memoria_usada > LIMITE_MEMORIA_MB * 1024 * 1024:
+        _, (_, _, tamano) = _entradas.popitem(last=False)
+        _memoria_usada -= tamano
+
+# Invalidar explícitamente todas las entradas de un usuario (p. ej. tras guardar o eliminar sus datos)
+def invalidar(user_id):
+    global _memoria_usada
+    with _lock:
+        for clave in [clave for clave in _entradas if clave[0] == user_id]:
+            _memoria_usada -= _entradas.pop(clave)[2]
+
+# Estado de la caché, útil para depuración
+def estadisticas():
+    with _lock:
+        return {"entradas": len(_entradas), "memoria_mb": _memoria_usada / (1024 * 1024), "limite_mb": LIMITE_MEMORIA_MB}
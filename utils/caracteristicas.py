@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+
+# Columnas derivadas que comparten todas las páginas.
+# Se calculan una sola vez por versión del dataset (al cargarlo en la caché) en lugar de en cada
+# página y en cada recarga; nunca se guardan en disco.
+COLUMNAS_DERIVADAS = ["Tiempo (s)", "Velocidad_Media", "Hora del Día", "Pendiente", "Año", "Fecha"]
+
+# Añadir las columnas derivadas a un DataFrame de actividades ya tipado
+def materializar_caracteristicas(df):
+    fechas = pd.to_datetime(df["Fecha de Inicio"], errors="coerce")
+    tiempo = df["Duración (min)"] * 60
+    distancia = df["Distancia (m)"]
+    # Con Copy-on-Write, assign añade las columnas sin copiar las existentes
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return df.drop(columns=COLUMNAS_DERIVADAS, errors="ignore").assign(**{
+            "Tiempo (s)": tiempo,
+            "Velocidad_Media": distancia / tiempo,
+            "Hora del Día": fechas.dt.hour,
+            "Pendiente": df["Elevación Ganada (m)"] / distancia,
+            "Año": fechas.dt.year.astype("Int64"),
+            "Fecha": fechas.dt.normalize(),
+        })
+
+# Quitar las columnas derivadas (p. ej. antes de guardar o exportar los datos)
+def quitar_caracteristicas(df):
+    return df.drop(columns=COLUMNAS_DERIVADAS, errors="ignore")
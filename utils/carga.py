@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+from utils import almacen
+from utils.data_manager import tiene_datos
+from utils.tiempos import cronometrado
+
+# Modelo de carga de entrenamiento diaria.
+# La carga de cada actividad es el TRIMP de Edwards (minutos en cada zona de frecuencia cardíaca
+# por el número de la zona). Con la carga diaria se calculan la carga aguda (ATL, fatiga) y la
+# crónica (CTL, forma física) como medias exponenciales, el balance TSB = CTL - ATL y el ratio
+# ACWR = ATL / CTL. La serie diaria se guarda por usuario y al añadir actividades solo se
+# recalculan (y se reescriben en el almacén) los días a partir de la primera actividad nueva,
+# partiendo del estado del día anterior.
+
+# Constantes de tiempo (días) de las cargas aguda y crónica
+CONSTANTE_AGUDA = 7
+CONSTANTE_CRONICA = 42
+
+# Peso de cada zona de frecuencia cardíaca en el TRIMP
+PESOS_ZONAS = {
+    "Tiempo en Zona 1 (s)": 1,
+    "Tiempo en Zona 2 (s)": 2,
+    "Tiempo en Zona 3 (s)": 3,
+    "Tiempo en Zona 4 (s)": 4,
+    "Tiempo en Zona 5 (s)": 5,
+}
+
+# Las actividades sin tiempo en zonas (p. ej. sin pulsómetro) cuentan como si fueran en zona 2
+PESO_SIN_ZONAS = 2
+
+# Tipos de las columnas de la serie de carga guardada en el almacén
+TIPOS_CARGA = {"Fecha": "datetime64[ns]", "Actividades": "int64", "Carga": "float64", "ATL": "float64",
+               "CTL": "float64", "TSB": "float64", "ACWR": "float64"}
+
+# Carga (TRIMP) de cada actividad
+def carga_actividades(df):
+    zonas = df[list(PESOS_ZONAS)].fillna(0).to_numpy(dtype=float) @ np.array(list(PESOS_ZONAS.values()), dtype=float) / 60
+    sin_zonas = df['Duración (min)'].fillna(0).to_numpy(dtype=float) * PESO_SIN_ZONAS
+    return pd.Series(np.where(zonas > 0, zonas, sin_zonas), index=df.index)
+
+# Día de cada actividad (NaT si la fecha no es válida). Si el DataFrame ya tiene las columnas
+# derivadas de utils.caracteristicas se usa su columna 'Fecha', sin volver a procesar las fechas.
+def dias_actividades(df):
+    if 'Fecha' in df.columns:
+        return df['Fecha']
+    return pd.to_datetime(df['Fecha de Inicio'], errors='coerce').dt.normalize()
+
+# Carga y número de actividades de cada día, sin huecos entre `inicio` (por defecto el primer día
+# con actividad) y el último día con actividad
+def carga_diaria(df, inicio=None):
+    dias = dias_actividades(df)
+    validas = dias.notna()
+    diario = pd.DataFrame({"Fecha": dias[validas], "Carga": carga_actividades(df)[validas]}).groupby("Fecha").agg(
+        Actividades=("Carga", "size"), Carga=("Carga", "sum")
+    )
+    if diario.empty:
+        return diario
+    calendario = pd.date_range(inicio if inicio is not None else diario.index.min(), diario.index.max(), freq="D", name="Fecha")
+    return diario.reindex(calendario, fill_value=0)
+
+# Media exponencial de la carga diaria partiendo del valor del día anterior (0 si no hay)
+def _media_exponencial(cargas, constante, inicial=0.0):
+    valores = np.concatenate([[inicial], cargas])
+    return pd.Series(valores).ewm(alpha=1 - np.exp(-1 / constante), adjust=False).mean().to_numpy()[1:]
+
+# Calcular ATL, CTL, TSB y ACWR de una serie diaria. `estado` es (ATL, CTL) del día anterior
+# al primero de la serie, para continuar una serie ya calculada.
+def calcular_carga(diario, estado=(0.0, 0.0)):
+    cargas = diario["Carga"].to_numpy(dtype=float)
+    atl = _media_exponencial(cargas, CONSTANTE_AGUDA, estado[0])
+    ctl = _media_exponencial(cargas, CONSTANTE_CRONICA, estado[1])
+    return pd.DataFrame({
+        "Fecha": diario.index,
+        "Actividades": diario["Actividades"].to_numpy(),
+        "Carga": cargas,
+        "ATL": atl,
+        "CTL": ctl,
+        "TSB": ctl - atl,
+        "ACWR": np.divide(atl, ctl, out=np.full(len(ctl), np.nan), where=ctl > 0),
+    })
+
+# Primer día en el que el número de actividades de `df` no coincide con la serie guardada
+# (None si coinciden todos)
+def _primer_dia_distinto(guardada, df):
+    actuales = dias_actividades(df).value_counts()
+    anteriores = guardada.set_index("Fecha")["Actividades"]
+    anteriores = anteriores[anteriores > 0]
+    dias = actuales.index.union(anteriores.index)
+    distintos = dias[actuales.reindex(dias, fill_value=0).to_numpy() != anteriores.reindex(dias, fill_value=0).to_numpy()]
+    return distintos.min() if len(distintos) else None
+
+# Calcular la serie completa de un usuario y guardarla en lugar de la que tuviera
+def _guardar_completa(user_id, df):
+    carga = calcular_carga(carga_diaria(df))
+    almacen.reemplazar("carga", user_id, carga)
+    return carga
+
+# Último día de la serie guardada anterior a `desde` (DataFrame de una fila; None o vacío si no hay)
+def _dia_anterior(user_id, desde):
+    return almacen.leer("carga", user_id, tipos=TIPOS_CARGA, orden='"Fecha" DESC', limite=1,
+                        condiciones=[('"Fecha" < ?', [desde.strftime(almacen.FORMATO_FECHA)])])
+
+# Actualizar la serie de carga de un usuario con sus actividades. `desde` es el primer día que ha
+# cambiado (p. ej. el de la actividad nueva más antigua): del almacén solo se lee la carga del día
+# anterior, de la que parte la serie, y solo se reescriben los días siguientes, que son los que se
+# devuelven. Si no se indica, se detecta comparando el número de actividades de cada día con la
+# serie guardada (que se lee entera) y se devuelve la serie completa. Si no hay serie guardada
+# anterior a ese día se recalcula y se guarda entera. Con `guardar=False` no se lee ni se escribe
+# nada en el almacén.
+@cronometrado()
+def actualizar_carga(user_id, df, desde=None, guardar=True):
+    if not guardar:
+        return calcular_carga(carga_diaria(df))
+
+    anteriores = None
+    if desde is None:
+        guardada = almacen.leer("carga", user_id, tipos=TIPOS_CARGA)
+        if guardada is None or guardada.empty:
+            return _guardar_completa(user_id, df)
+        desde = _primer_dia_distinto(guardada, df)
+        if desde is None:
+            return guardada
+        anteriores = guardada[guardada["Fecha"] < desde]
+        anterior = anteriores.tail(1)
+    else:
+        anterior = _dia_anterior(user_id, pd.Timestamp(desde).normalize())
+    if anterior is None or anterior.empty:
+        return _guardar_completa(user_id, df)
+
+    # Continuar la serie desde el día siguiente al último que no ha cambiado
+    ultimo = anterior.iloc[-1]
+    recientes = df[dias_actividades(df) > ultimo["Fecha"]]
+    nuevos = calcular_carga(carga_diaria(recientes, inicio=ultimo["Fecha"] + pd.Timedelta(days=1)),
+                            estado=(ultimo["ATL"], ultimo["CTL"]))
+    almacen.reemplazar("carga", user_id, nuevos,
+                       condiciones=[('"Fecha" > ?', [ultimo["Fecha"].strftime(almacen.FORMATO_FECHA)])])
+    return nuevos if anteriores is None else pd.concat([anteriores, nuevos], ignore_index=True)
+
+# Serie de carga de un usuario para mostrarla. Solo se guarda si el usuario tiene datos propios
+# (la muestra compartida se calcula en memoria).
+def obtener_carga(user_id, df):
+    return actualizar_carga(user_id, df, guardar=tiene_datos(user_id))
@@ -0,0 +1,46 @@
+import plotly.express as px
+from sklearn.preprocessing import StandardScaler
+from utils.agrupamiento import etiquetas_dbscan
+from utils.renderizado import modo_render
+from utils.tiempos import cronometrado
+
+# Clustering de actividades con DBSCAN (cálculo de la página de clustering, sin Streamlit)
+
+# Deportes que se agrupan
+DEPORTES_CLUSTERING = ['running', 'cycling']
+
+# Agrupar las actividades con DBSCAN: devuelve las actividades con su grupo ('Cluster', -1 si es
+# ruido) y el gráfico de dispersión de los grupos
+@cronometrado()
+def aplicar_clustering(df, eps=0.5, min_samples=5):
+    # Filtrar solo actividades de Running y Ciclismo
+    df = df[df['Deporte'].isin(DEPORTES_CLUSTERING)]
+    
+    # Selección de variables relevantes ('Tiempo (s)' y 'Velocidad_Media' vienen calculadas al cargar los datos)
+    df = df[['Distancia (m)', 'Tiempo (s)', 'Velocidad_Media', 'Elevación Ganada (m)', 'Frecuencia Cardíaca Media']]
+    
+    # Manejo de valores nulos
+    df = df.dropna()
+    
+    # Normalización de los datos
+    scaler = StandardScaler()
+    df_scaled = scaler.fit_transform(df)
+    
+    # Aplicar DBSCAN: los vecinos y los árboles de cada min_samples se precalculan una vez por
+    # versión de los datos, así que mover los sliders no vuelve a ejecutar DBSCAN
+    clusters = etiquetas_dbscan(df_scaled, eps, min_samples)
+    df['Cluster'] = clusters
+    
+    # Crear gráfico interactivo con plotly
+    fig = px.scatter(
+        df, 
+        x='Distancia (m)', 
+        y='Velocidad_Media', 
+        color=df['Cluster'].astype(str),
+        title="Clustering de Actividades Deportivas con DBSCAN",
+        labels={"Distancia (m)": "Distancia (m)", "Velocidad_Media": "Velocidad Media (m/s)"},
+        color_discrete_sequence=px.colors.qualitative.Set1,
+        render_mode=modo_render(len(df))
+    )
+    
+    return df, fig
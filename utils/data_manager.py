@@ -1,51 +1,179 @@
 import os
-import time
+import threading
 import pandas as pd
-import streamlit as st
+from utils import almacen, cache, retencion
+from utils.caracteristicas import materializar_caracteristicas, quitar_caracteristicas
+from utils.tiempos import cronometrado
+
+# Copy-on-Write: las páginas reciben vistas de los datasets cacheados y cualquier modificación
+# sobre ellas (o sobre un DataFrame filtrado) crea su propia copia sin alterar el original
+pd.set_option("mode.copy_on_write", True)
 
 # Asegurarse de que exista la carpeta "data"
 if not os.path.exists("data"):
     os.makedirs("data")
 
-# Función para obtener el nombre del archivo basándose en el user_id pasado
-def get_user_file_path(user_id):
-    return f"data/actividades_{user_id}.csv"
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MUESTRA_CSV = os.path.join(BASE_DIR, "..", "data", "actividades_muestra.csv")
 
-# Guardar los datos: requiere el DataFrame y el user_id de la sesión
-def save_data(df, user_id):
-    limpiar_archivos_antiguos("data")  # Limpieza automática
-    try:
-        df.to_csv(get_user_file_path(user_id), index=False)
-        # st.write(f"Datos guardados en {get_user_file_path(user_id)}")
-    except Exception as e:
-        st.error(f"Ocurrió un error al guardar los datos: {e}")
-
-# Cargar los datos: requiere el user_id de la sesión
-def load_data(user_id):
-    path = get_user_file_path(user_id)
-    try:
-        # Si el archivo del usuario no existe, se carga el CSV de muestra
-        if not os.path.exists(path):
-            st.warning('Puesto que no se han subido datos, se mostrará un archivo de muestra.', icon="⚠️")
-            BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-            muestra_path = os.path.join(BASE_DIR, "..", "data", "actividades_muestra.csv")
-            return pd.read_csv(muestra_path)
+# Esquema de tipos de las actividades: el resto de columnas se guardan como float
+COLUMNAS_FECHA = ["Fecha de Inicio"]
+COLUMNAS_CATEGORICAS = ["Deporte"]
+COLUMNAS_TEXTO = ["Nombre de la Actividad", "Lugar"]
+COLUMNAS_ENTERAS = ["Activity ID"]
+
+# Dataset de muestra: se carga una única vez por proceso y lo comparten todas las sesiones
+_muestra = None
+_muestra_lock = threading.Lock()
+
+# Agregaciones de resumen_actividades: nombre -> (expresión SQL, función sobre el DataFrame)
+AGRUPACIONES = {
+    "Deporte": ('"Deporte"', lambda df: df["Deporte"].astype("string")),
+    "Año": ('CAST(substr("Fecha de Inicio", 1, 4) AS INTEGER)', lambda df: df["Fecha de Inicio"].dt.year),
+}
+
+# Versión de los datos de un usuario (cambia cada vez que se reescriben). Sirve para cachear
+# resultados derivados de los datos; el dataset de muestra tiene una versión fija.
+def version_datos(user_id):
+    version = almacen.version(user_id)
+    return version if version is not None else "muestra"
 
+# Si el usuario tiene datos propios guardados (si no, se le muestra el dataset de muestra)
+def tiene_datos(user_id):
+    return version_datos(user_id) != "muestra"
+
+# Propietario de los datos que se muestran a un usuario: él mismo si tiene datos guardados o
+# "muestra" (compartido por todas las sesiones) si se le muestra el dataset de muestra
+def propietario_datos(user_id):
+    return user_id if tiene_datos(user_id) else "muestra"
+
+# Aplicar el esquema de tipos a un DataFrame de actividades (p. ej. recién leído de CSV)
+def tipar_actividades(df):
+    df = df.copy()
+    for col in df.columns:
+        if col in COLUMNAS_FECHA:
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+        elif col in COLUMNAS_CATEGORICAS:
+            df[col] = df[col].astype("category")
+        elif col in COLUMNAS_TEXTO:
+            df[col] = df[col].astype("string")
+        elif col in COLUMNAS_ENTERAS:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
         else:
-            # Si el archivo existe, se cargan los datos
-            return pd.read_csv(path)
-    except Exception as e:
-        st.error(f"Ocurrió un error al cargar los datos: {e}")
-        return None
-
-# Limpiar archivos viejos (por defecto, archivos con más de 15 minutos)
-def limpiar_archivos_antiguos(directorio, edad_maxima_segundos=900):
-    ahora = time.time()
-    for archivo in os.listdir(directorio):
-        if archivo.endswith(".csv"):
-            ruta = os.path.join(directorio, archivo)
-            try:
-                if ahora - os.path.getmtime(ruta) > edad_maxima_segundos:
-                    os.remove(ruta)
-            except Exception as e:
-                st.warning(f"No se pudo eliminar el archivo {archivo}: {e}")
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+    return df
+
+# Condiciones SQL de los filtros por deporte y por año (los años son rangos de "Fecha de Inicio",
+# que así usan los índices del almacén)
+def _condiciones(deportes=None, años=None):
+    condiciones = []
+    if deportes is not None:
+        condiciones.append((f'"Deporte" IN ({", ".join("?" * len(deportes))})', list(deportes)))
+    if años is not None:
+        rangos = ['("Fecha de Inicio" >= ? AND "Fecha de Inicio" < ?)'] * len(años)
+        limites = [fecha for año in años for fecha in (f"{int(año)}-01-01", f"{int(año) + 1}-01-01")]
+        condiciones.append((" OR ".join(rangos) or "0", limites))
+    return condiciones
+
+# Los mismos filtros aplicados en pandas (para el dataset de muestra)
+def _filtrar(df, deportes=None, años=None):
+    if deportes is not None:
+        df = df[df["Deporte"].isin(deportes)]
+    if años is not None:
+        df = df[df["Fecha de Inicio"].dt.year.isin(años)]
+    return df
+
+# Guardar los datos: requiere el DataFrame y el user_id de la sesión. Los errores se propagan
+# para que los muestre la página que ha pedido el guardado.
+@cronometrado()
+def save_data(df, user_id):
+    retencion.registrar_uso(user_id)  # La limpieza de datos caducados se hace en segundo plano
+    almacen.reemplazar("actividades", user_id, tipar_actividades(quitar_caracteristicas(df)))
+    cache.invalidar(user_id)
+
+# Añadir actividades a las guardadas de un usuario (o sustituir las que tengan el mismo Activity ID)
+# sin reescribir el resto; cambia la versión de sus datos, así que la caché se invalida
+def añadir_actividades(df, user_id):
+    retencion.registrar_uso(user_id)
+    if len(df) == 0:
+        return
+    almacen.añadir("actividades", user_id, tipar_actividades(quitar_caracteristicas(df)))
+    cache.invalidar(user_id)
+
+# Leer las actividades guardadas de un usuario, filtradas en el almacén por deporte y año, de más
+# reciente a más antigua (None si nunca ha guardado actividades; un DataFrame vacío con todas las
+# columnas si guardó una descarga sin actividades)
+def leer_actividades(user_id, deportes=None, años=None):
+    df = almacen.leer("actividades", user_id, condiciones=_condiciones(deportes, años),
+                      orden='"Fecha de Inicio" DESC, rowid')
+    if df is None:
+        if almacen.version(user_id) is None:
+            return None
+        df = pd.DataFrame(columns=almacen.columnas("actividades"))
+    return tipar_actividades(df)
+
+# Leer el dataset de un usuario con las columnas derivadas ya calculadas (se cachea por versión)
+@cronometrado()
+def cargar_actividades(user_id, deportes=None, años=None):
+    return materializar_caracteristicas(leer_actividades(user_id, deportes, años))
+
+# Obtener el dataset de muestra compartido (solo lectura), con las columnas derivadas
+def cargar_muestra():
+    global _muestra
+    with _muestra_lock:
+        if _muestra is None:
+            _muestra = materializar_caracteristicas(importar_csv(MUESTRA_CSV))
+    return _muestra
+
+# Cargar los datos: requiere el user_id de la sesión. `columns` permite leer solo las columnas necesarias,
+# y `deportes` y `años` filtran las actividades en el almacén (p. ej. deportes=["running"]).
+# Los datasets se sirven desde la caché compartida, con las columnas derivadas de
+# utils.caracteristicas ya calculadas. Cada llamada recibe una copia superficial: con Copy-on-Write
+# los datos solo se copian si la página los modifica, y nunca se altera la versión cacheada.
+# No depende de Streamlit: el aviso de que se muestra la muestra lo da la página (ver tiene_datos).
+@cronometrado()
+def load_data(user_id, columns=None, deportes=None, años=None):
+    version = version_datos(user_id)
+    # Si el usuario no tiene datos guardados, se carga el CSV de muestra
+    if version == "muestra":
+        df = _filtrar(cargar_muestra(), deportes, años)
+
+    else:
+        # Si tiene datos, se cargan del almacén
+        retencion.registrar_uso(user_id)
+        filtros = tuple(tuple(f) if f is not None else None for f in (deportes, años))
+        df = cache.obtener((user_id, filtros), version, lambda: cargar_actividades(user_id, deportes, años))
+    return (df[columns] if columns is not None else df).copy(deep=False)
+
+# Importar un CSV de actividades aplicando el esquema de tipos
+def importar_csv(path, columns=None):
+    return tipar_actividades(pd.read_csv(path, usecols=columns))
+
+# Resumen de las actividades de un usuario agrupadas por `por` ("Deporte" o "Año"): número de
+# actividades, distancia, duración y calorías. La agregación se hace en el almacén (o en pandas
+# para el dataset de muestra), sin cargar las actividades.
+def resumen_actividades(user_id, por="Deporte", deportes=None, años=None):
+    expresion, agrupar = AGRUPACIONES[por]
+    if not tiene_datos(user_id):
+        df = _filtrar(cargar_muestra(), deportes, años)
+        resumen = df.groupby(agrupar(df)).agg(**{
+            "Actividades": ("Deporte", "size"),
+            "Distancia (km)": ("Distancia (m)", lambda x: x.sum() / 1000),
+            "Duración (h)": ("Duración (min)", lambda x: x.sum() / 60),
+            "Calorías": ("Calorías", "sum"),
+        }).rename_axis(por).reset_index()
+    else:
+        condiciones = _condiciones(deportes, años)
+        donde = "".join(f" AND ({sql})" for sql, _ in condiciones)
+        resumen = almacen.consultar(
+            f'''SELECT {expresion} AS "{por}", COUNT(*) AS "Actividades",
+                   TOTAL("Distancia (m)") / 1000 AS "Distancia (km)", TOTAL("Duración (min)") / 60 AS "Duración (h)",
+                   TOTAL("Calorías") AS "Calorías"
+            FROM actividades WHERE user_id = ?{donde} GROUP BY 1''',
+            [user_id] + [p for _, ps in condiciones for p in ps])
+    return resumen.sort_values("Actividades", ascending=False, kind="stable").reset_index(drop=True)
+
+# Exportar los datos de un usuario a CSV (devuelve el contenido, p. ej. para st.download_button)
+def exportar_csv(user_id):
+    df = load_data(user_id)
+    return quitar_caracteristicas(df).to_csv(index=False).encode("utf-8")
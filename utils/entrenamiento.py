@@ -0,0 +1,361 @@
+import math
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from joblib.externals.loky import ProcessPoolExecutor
+from joblib.externals.loky.process_executor import BrokenProcessPool
+from sklearn.base import clone
+from sklearn.linear_model import Ridge
+from sklearn.metrics import mean_absolute_error
+from sklearn.model_selection import KFold, ParameterSampler, train_test_split
+
+# Motor de entrenamiento en paralelo.
+# La búsqueda de hiperparámetros se descompone en tareas (modelo, combinación de parámetros, fold)
+# que se reparten en un pool de procesos compartido por todo el servidor. Cada sesión reserva
+# como mucho WORKERS_POR_SESION huecos y el total de tareas en curso del proceso nunca supera
+# MAX_WORKERS_PROCESO, de modo que el entrenamiento de un usuario no deja sin CPU al resto.
+
+MAX_WORKERS_PROCESO = int(os.environ.get("GARMIN_MAX_WORKERS", os.cpu_count() or 1))
+WORKERS_POR_SESION = int(os.environ.get("GARMIN_WORKERS_SESION", "2"))
+
+# Parada temprana de XGBoost y LightGBM: fracción de datos reservada y rondas sin mejora
+FRACCION_PARADA_TEMPRANA = 0.1
+RONDAS_PARADA_TEMPRANA = 10
+
+# Árboles (o rondas de boosting) que se añaden al actualizar un modelo ya entrenado
+RONDAS_INCREMENTALES = 20
+
+# Veces que se vuelven a lanzar las tareas de una llamada si el pool se rompe (p. ej. porque el
+# sistema mata un proceso hijo por falta de memoria)
+REINTENTOS_POOL = 1
+
+_huecos = threading.BoundedSemaphore(MAX_WORKERS_PROCESO)
+_pool = None
+_pool_lock = threading.Lock()
+
+# Pool de procesos compartido, creado la primera vez que se necesita.
+# Se usa el ejecutor de loky (el mismo que usa joblib/scikit-learn): no hace fork del servidor
+# ni vuelve a ejecutar el script principal en los procesos hijos. Si se pasa el pool `roto` (uno
+# de sus procesos ha muerto) y sigue siendo el compartido, se descarta y se crea uno nuevo; si otra
+# sesión ya lo ha sustituido se devuelve el nuevo.
+def obtener_pool(roto=None):
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool is roto:
+            _pool.shutdown(wait=False, kill_workers=True)
+            _pool = None
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS_PROCESO)
+    return _pool
+
+# Reservar hasta `n` huecos del presupuesto del proceso. Siempre se obtiene al menos uno
+# (esperando si hace falta); el resto solo si están libres en ese momento.
+@contextmanager
+def reservar_workers(n):
+    _huecos.acquire()
+    reservados = 1
+    while reservados < n and _huecos.acquire(blocking=False):
+        reservados += 1
+    try:
+        yield reservados
+    finally:
+        for _ in range(reservados):
+            _huecos.release()
+
+# Cada tarea usa un único hilo para no competir con el resto de procesos del pool
+def _un_hilo(estimador):
+    if "n_jobs" in estimador.get_params():
+        estimador.set_params(n_jobs=1)
+    return estimador
+
+# Ajustar un estimador. Con `parada_temprana`, XGBoost y LightGBM reservan una parte de los datos
+# de entrenamiento y dejan de añadir árboles cuando el error en ella deja de mejorar
+# (n_estimators pasa a ser el máximo de árboles).
+def ajustar_estimador(estimador, params, X, y, parada_temprana=False):
+    modelo = _un_hilo(clone(estimador).set_params(**params))
+    tipo = type(modelo).__name__
+    if not parada_temprana or tipo not in ("XGBRegressor", "LGBMRegressor"):
+        return modelo.fit(X, y)
+
+    X_fit, X_es, y_fit, y_es = train_test_split(X, y, test_size=FRACCION_PARADA_TEMPRANA, random_state=0)
+    if tipo == "XGBRegressor":
+        modelo.set_params(early_stopping_rounds=RONDAS_PARADA_TEMPRANA)
+        return modelo.fit(X_fit, y_fit, eval_set=[(X_es, y_es)], verbose=False)
+    import lightgbm
+    return modelo.fit(X_fit, y_fit, eval_set=[(X_es, y_es)],
+                      callbacks=[lightgbm.early_stopping(RONDAS_PARADA_TEMPRANA, verbose=False)])
+
+# Tarea: ajustar un estimador con unos parámetros en un fold y devolver el MAE de validación,
+# los segundos que ha tardado y las predicciones del fold de validación
+def _evaluar_fold(estimador, params, X, y, train_idx, val_idx, parada_temprana=False):
+    inicio = time.perf_counter()
+    modelo = ajustar_estimador(estimador, params, X[train_idx], y[train_idx], parada_temprana)
+    y_pred = modelo.predict(X[val_idx])
+    return mean_absolute_error(y[val_idx], y_pred), time.perf_counter() - inicio, y_pred
+
+# Ejecutar tareas en el pool con como mucho `n_workers` en curso a la vez.
+# `al_terminar(clave, resultado)` se llama en el hilo que invoca, según van terminando.
+# Si el pool se rompe, se sustituye por uno nuevo y las tareas sin terminar se vuelven a lanzar
+# (hasta REINTENTOS_POOL veces por llamada, para no repetir sin fin una tarea que siempre lo rompe).
+def ejecutar_tareas(tareas, al_terminar, n_workers=WORKERS_POR_SESION):
+    pool = obtener_pool()
+    reintentos = REINTENTOS_POOL
+    with reservar_workers(n_workers) as reservados:
+        pendientes = list(tareas.items())[::-1]
+        en_curso = {}
+        while pendientes or en_curso:
+            try:
+                while pendientes and len(en_curso) < reservados:
+                    clave, (funcion, args) = pendientes[-1]
+                    futuro = pool.submit(funcion, *args)
+                    en_curso[futuro] = pendientes.pop()
+                terminadas, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+                for futuro in terminadas:
+                    resultado = futuro.result()
+                    al_terminar(en_curso.pop(futuro)[0], resultado)
+            except BrokenProcessPool:
+                if reintentos == 0:
+                    raise
+                reintentos -= 1
+                pendientes += list(en_curso.values())
+                en_curso = {}
+                pool = obtener_pool(roto=pool)
+
+# Evaluar con validación cruzada los candidatos seleccionados de cada modelo.
+# `seleccion` es {modelo: [índices de candidato]} y `filas` {modelo: filas de X a usar}.
+# Devuelve {modelo: {candidato: MAE medio}}, el tiempo de ajuste consumido por cada modelo y las
+# predicciones fuera de fold {modelo: {candidato: array}} (NaN en las filas no evaluadas).
+def _evaluar_candidatos(modelos, candidatos, seleccion, filas, X, y, cv, parada_temprana, n_workers, al_completar=None):
+    tareas = {}
+    folds = {}
+    for name, indices in seleccion.items():
+        folds[name] = [(filas[name][train], filas[name][val]) for train, val in KFold(n_splits=cv).split(filas[name])]
+        for i in indices:
+            for j, (train_idx, val_idx) in enumerate(folds[name]):
+                tareas[(name, i, j)] = (_evaluar_fold, (modelos[name], candidatos[name][i], X, y, train_idx, val_idx, parada_temprana))
+
+    errores = {name: {i: [0.0] * cv for i in indices} for name, indices in seleccion.items()}
+    oof = {name: {i: np.full(len(X), np.nan) for i in indices} for name, indices in seleccion.items()}
+    tiempos = {name: 0.0 for name in seleccion}
+    def al_terminar(clave, resultado):
+        name, i, j = clave
+        errores[name][i][j], segundos, y_pred = resultado
+        oof[name][i][folds[name][j][1]] = y_pred
+        tiempos[name] += segundos
+        if al_completar is not None:
+            al_completar(name)
+    ejecutar_tareas(tareas, al_terminar, n_workers)
+    medias = {name: {i: float(np.mean(maes)) for i, maes in por_candidato.items()} for name, por_candidato in errores.items()}
+    return medias, tiempos, oof
+
+# Reajustar el mejor candidato de cada modelo sobre todos los datos
+def _reajustar(modelos, mejores_params, X, y, parada_temprana, n_workers, al_completar=None):
+    best_models = {}
+    def al_terminar(name, modelo):
+        best_models[name] = modelo
+        if al_completar is not None:
+            al_completar(name)
+    tareas = {name: (ajustar_estimador, (modelo, mejores_params[name], X, y, parada_temprana)) for name, modelo in modelos.items()}
+    ejecutar_tareas(tareas, al_terminar, n_workers)
+    # Mantener el orden original de los modelos
+    return {name: best_models[name] for name in modelos}
+
+# Búsqueda aleatoria de hiperparámetros en paralelo, equivalente a un RandomizedSearchCV por
+# modelo (mismo muestreo de parámetros, mismos folds y reajuste final sobre todos los datos).
+# `progreso(fraccion, texto)` se actualiza con cada tarea terminada.
+# Devuelve los mejores estimadores ya ajustados, su MAE medio en validación cruzada, una tabla
+# con los resultados de cada combinación probada y las predicciones fuera de fold del mejor
+# candidato de cada modelo (sirven para entrenar un ensemble sin volver a ajustar nada).
+def busqueda_paralela(modelos, param_distributions, X, y, n_iter=5, cv=3, random_state=42,
+                      n_workers=WORKERS_POR_SESION, progreso=None):
+    X = np.asarray(X)
+    y = np.asarray(y)
+    candidatos = {name: list(ParameterSampler(param_distributions[name], n_iter, random_state=random_state))
+                  for name in modelos}
+    total = sum(len(c) for c in candidatos.values()) * cv + len(modelos)  # folds + reajuste final
+    completadas = [0]
+    def al_completar(name):
+        completadas[0] += 1
+        if progreso is not None:
+            progreso(completadas[0] / total, f"Entrenando modelo {name}...")
+
+    seleccion = {name: list(range(len(candidatos[name]))) for name in modelos}
+    filas = {name: np.arange(len(X)) for name in modelos}
+    medias, _, oof = _evaluar_candidatos(modelos, candidatos, seleccion, filas, X, y, cv, False, n_workers, al_completar)
+
+    # Mejor combinación de cada modelo (en caso de empate, la primera, como en scikit-learn)
+    ganadores = {name: min(seleccion[name], key=medias[name].get) for name in modelos}
+    best_scores = {name: medias[name][ganadores[name]] for name in modelos}
+    predicciones_oof = {name: oof[name][ganadores[name]] for name in modelos}
+    best_models = _reajustar(modelos, {name: candidatos[name][i] for name, i in ganadores.items()}, X, y, False, n_workers, al_completar)
+
+    resultados = pd.DataFrame([
+        {"Modelo": name, "Ronda": 0, "Muestras": len(X), "Parámetros": candidatos[name][i], "MAE": mae}
+        for name in modelos for i, mae in medias[name].items()
+    ])
+    return best_models, best_scores, resultados, predicciones_oof
+
+# Número de muestras de cada ronda de successive halving: los candidatos se dividen entre `factor`
+# en cada ronda hasta quedar uno, que se evalúa con todos los datos
+def _rondas_halving(n_candidatos, n, factor, min_muestras):
+    n_rondas = 1
+    while n_candidatos > 1:
+        n_candidatos = math.ceil(n_candidatos / factor)
+        n_rondas += 1
+    return [min(n, max(min_muestras, n // factor ** (n_rondas - 1 - r))) for r in range(n_rondas)]
+
+# Búsqueda con presupuesto de tiempo mediante successive halving.
+# Cada modelo empieza con `n_candidatos` combinaciones evaluadas sobre pocas muestras; en cada
+# ronda solo sigue la mejor fracción 1/`factor` y las muestras se multiplican por `factor`, hasta
+# que el ganador se evalúa con todos los datos. Antes de cada ronda se estima su coste con lo que
+# han tardado los ajustes anteriores de cada modelo: si no cabe en lo que queda de presupuesto,
+# los modelos más caros dejan de reducir candidatos y pasan a la fase final con su mejor candidato
+# hasta el momento. La fase final (validar ese candidato con todos los datos y reajustarlo) se
+# ejecuta siempre, así que el presupuesto acota la búsqueda pero no esos últimos ajustes.
+# XGBoost y LightGBM usan además parada temprana. Devuelve lo mismo que `busqueda_paralela`.
+def busqueda_halving(modelos, param_distributions, X, y, presupuesto_segundos=60, n_candidatos=9, factor=3,
+                     cv=3, random_state=42, min_muestras=60, n_workers=WORKERS_POR_SESION, progreso=None):
+    inicio = time.perf_counter()
+    X = np.asarray(X)
+    y = np.asarray(y)
+    n = len(X)
+    orden = np.random.RandomState(random_state).permutation(n)
+    paralelismo = max(1, min(n_workers, MAX_WORKERS_PROCESO))
+    candidatos = {name: list(ParameterSampler(param_distributions[name], n_candidatos, random_state=random_state))
+                  for name in modelos}
+    rondas = {name: _rondas_halving(len(candidatos[name]), n, factor, min_muestras) for name in modelos}
+
+    vivos = {name: list(range(len(candidatos[name]))) for name in modelos}
+    ultimas_medias = {name: {} for name in modelos}  # MAE de los candidatos en su última ronda
+    ultimas_oof = {name: {} for name in modelos}     # y sus predicciones fuera de fold
+    muestras_evaluadas = {name: 0 for name in modelos}
+    segundos_por_muestra = {}
+    historial = []
+
+    def informar(texto):
+        if progreso is not None:
+            progreso(min((time.perf_counter() - inicio) / presupuesto_segundos, 0.95), texto)
+
+    activos = list(modelos)
+    ronda = 0
+    while activos:
+        seleccion = {name: vivos[name] for name in activos}
+        if ronda > 0:
+            # Coste estimado de la ronda y de lo que cada modelo necesitará como mínimo después
+            # (validar a su ganador con todos los datos y reajustarlo)
+            coste = {name: len(vivos[name]) * cv * segundos_por_muestra[name] * rondas[name][ronda] for name in activos}
+            final = {name: (cv + 1) * segundos_por_muestra[name] * n for name in modelos}
+            def cabe():
+                pendiente = sum(coste[m] for m in seleccion) + sum(final.values())
+                return time.perf_counter() - inicio + pendiente / paralelismo <= presupuesto_segundos
+            for name in sorted(activos, key=coste.get, reverse=True):
+                if cabe():
+                    break
+                del seleccion[name]
+            if not seleccion:
+                break
+
+        informar(f"Ronda {ronda + 1}: evaluando {', '.join(seleccion)}...")
+        filas = {name: orden[:rondas[name][ronda]] for name in seleccion}
+        medias, tiempos, oof = _evaluar_candidatos(modelos, candidatos, seleccion, filas, X, y, cv, True, n_workers,
+                                                   lambda name: informar(f"Ronda {ronda + 1}: evaluando {name}..."))
+
+        activos = []
+        for name in seleccion:
+            muestras = rondas[name][ronda]
+            segundos_por_muestra[name] = tiempos[name] / (len(seleccion[name]) * cv * muestras)
+            ultimas_medias[name] = medias[name]
+            ultimas_oof[name] = oof[name]
+            muestras_evaluadas[name] = muestras
+            historial += [{"Modelo": name, "Ronda": ronda, "Muestras": muestras, "Parámetros": candidatos[name][i], "MAE": mae}
+                          for i, mae in medias[name].items()]
+            # Quedarse con la mejor fracción de candidatos para la siguiente ronda
+            mantener = max(1, math.ceil(len(medias[name]) / factor))
+            vivos[name] = sorted(medias[name], key=medias[name].get)[:mantener]
+            if ronda + 1 < len(rondas[name]):
+                activos.append(name)
+        ronda += 1
+
+    # Fase final: el mejor candidato de cada modelo se valida con todos los datos si la búsqueda
+    # se cortó antes de llegar a ellos, y después se reajusta sobre todos los datos
+    ganadores = {name: vivos[name][0] for name in modelos}
+    best_scores = {name: ultimas_medias[name][ganadores[name]] for name in modelos}
+    predicciones_oof = {name: ultimas_oof[name][ganadores[name]] for name in modelos}
+    pendientes = {name: [ganadores[name]] for name in modelos if muestras_evaluadas[name] < n}
+    if pendientes:
+        informar("Validando los mejores candidatos con todos los datos...")
+        filas = {name: np.arange(n) for name in pendientes}
+        medias, _, oof = _evaluar_candidatos(modelos, candidatos, pendientes, filas, X, y, cv, True, n_workers)
+        for name in pendientes:
+            best_scores[name] = medias[name][ganadores[name]]
+            predicciones_oof[name] = oof[name][ganadores[name]]
+            historial.append({"Modelo": name, "Ronda": ronda, "Muestras": n, "Parámetros": candidatos[name][ganadores[name]], "MAE": best_scores[name]})
+
+    informar("Ajustando los modelos finales...")
+    best_models = _reajustar(modelos, {name: candidatos[name][i] for name, i in ganadores.items()}, X, y, True, n_workers)
+    return best_models, best_scores, pd.DataFrame(historial), predicciones_oof
+
+# Ensemble por stacking construido a partir de modelos ya ajustados.
+# Equivale al StackingRegressor de scikit-learn, pero el estimador final se entrena con las
+# predicciones fuera de fold que ya calculó la búsqueda, en lugar de volver a validar y ajustar
+# todos los modelos base desde cero.
+class EnsembleApilado:
+    def __init__(self, estimadores, final_estimator):
+        self.estimadores = estimadores            # {nombre: modelo base ya ajustado}
+        self.final_estimator = final_estimator    # combinación de las predicciones de los modelos base
+
+    # Combinar predicciones ya calculadas de los modelos base (una columna por modelo, en el
+    # orden de `estimadores`)
+    def combinar(self, predicciones_base):
+        return self.final_estimator.predict(predicciones_base)
+
+    def predict(self, X):
+        return self.combinar(np.column_stack([modelo.predict(X) for modelo in self.estimadores.values()]))
+
+# Entrenar el estimador final del stacking con las predicciones fuera de fold de los modelos base
+def apilar_modelos(estimadores, predicciones_oof, y, final_estimator=None):
+    Z = np.column_stack([predicciones_oof[name] for name in estimadores])
+    final = clone(final_estimator if final_estimator is not None else Ridge()).fit(Z, np.asarray(y))
+    return EnsembleApilado(estimadores, final)
+
+# Continuar el entrenamiento de un modelo ya ajustado con los datos actuales, manteniendo sus
+# hiperparámetros. XGBoost y LightGBM añaden `rondas_extra` rondas de boosting a partir del modelo
+# anterior, GradientBoosting y RandomForest añaden árboles con warm_start y los modelos lineales
+# parten de los coeficientes anteriores, así que la actualización cuesta una fracción del ajuste.
+def continuar_entrenamiento(modelo, X, y, rondas_extra=RONDAS_INCREMENTALES):
+    tipo = type(modelo).__name__
+    if tipo == "XGBRegressor":
+        booster = modelo.get_booster()
+        # Si se usó parada temprana se continúa desde la mejor iteración
+        try:
+            booster = booster[:modelo.best_iteration + 1]
+        except AttributeError:
+            pass
+        nuevo = _un_hilo(clone(modelo).set_params(n_estimators=rondas_extra, early_stopping_rounds=None))
+        return nuevo.fit(X, y, xgb_model=booster, verbose=False)
+    if tipo == "LGBMRegressor":
+        nuevo = _un_hilo(clone(modelo).set_params(n_estimators=rondas_extra))
+        return nuevo.fit(X, y, init_model=modelo.booster_)
+    _un_hilo(modelo)
+    if tipo in ("GradientBoostingRegressor", "RandomForestRegressor"):
+        modelo.set_params(warm_start=True, n_estimators=modelo.n_estimators + rondas_extra)
+    elif "warm_start" in modelo.get_params():
+        modelo.set_params(warm_start=True)
+    return modelo.fit(X, y)
+
+# Actualizar en paralelo varios modelos ya ajustados con `continuar_entrenamiento`
+def continuar_modelos(modelos, X, y, rondas_extra=RONDAS_INCREMENTALES, n_workers=WORKERS_POR_SESION, al_completar=None):
+    X = np.asarray(X)
+    y = np.asarray(y)
+    actualizados = {}
+    def al_terminar(name, modelo):
+        actualizados[name] = modelo
+        if al_completar is not None:
+            al_completar(name)
+    tareas = {name: (continuar_entrenamiento, (modelo, X, y, rondas_extra)) for name, modelo in modelos.items()}
+    ejecutar_tareas(tareas, al_terminar, n_workers)
+    return {name: actualizados[name] for name in modelos}
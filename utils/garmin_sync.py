@@ -0,0 +1,218 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from utils import almacen, carga, retencion
+from utils.data_manager import añadir_actividades, leer_actividades, save_data, tipar_actividades
+from utils.tiempos import cronometrado
+
+# Tamaño de página al pedir actividades a Garmin y máximo de actividades a descargar
+TAM_PAGINA = 100
+MAX_ACTIVIDADES = 5000
+
+# Páginas descargadas en paralelo y reintentos por página (con espera exponencial)
+MAX_WORKERS = 4
+REINTENTOS = 3
+ESPERA_REINTENTO = 1.0
+
+# Correspondencia entre columnas del dataset y campos del JSON de Garmin: (clave o ruta, valor por defecto).
+# Para añadir un campo nuevo de Garmin basta con añadir una entrada a esta tabla.
+CAMPOS_GARMIN = {
+    "Activity ID": ("activityId", None),
+    "Nombre de la Actividad": ("activityName", None),
+    "Fecha de Inicio": ("startTimeLocal", None),
+    "Deporte": (("activityType", "typeKey"), None),
+    "Distancia (m)": ("distance", None),
+    "Velocidad media (m/s)": ("averageSpeed", None),
+    "Velocidad máxima (m/s)": ("maxSpeed", None),
+    "Calorías": ("calories", None),
+    "Tasa Metabólica Basal": ("bmrCalories", None),
+    "Frecuencia Cardíaca Media": ("averageHR", None),
+    "Frecuencia Cardíaca Máxima": ("maxHR", None),
+    "Tiempo en Zona 1 (s)": ("hrTimeInZone_1", 0),
+    "Tiempo en Zona 2 (s)": ("hrTimeInZone_2", 0),
+    "Tiempo en Zona 3 (s)": ("hrTimeInZone_3", 0),
+    "Tiempo en Zona 4 (s)": ("hrTimeInZone_4", 0),
+    "Tiempo en Zona 5 (s)": ("hrTimeInZone_5", 0),
+    "VO2Max": ("vO2MaxValue", None),
+    "Elevación Ganada (m)": ("elevationGain", None),
+    "Elevación Perdida (m)": ("elevationLoss", None),
+    "Potencia Media (W)": ("averagePower", None),
+    "Potencia Máxima (W)": ("maxPower", None),
+    "Temperatura (°C)": ("temperature", None),
+    "Latitud": ("startLatitude", None),
+    "Longitud": ("startLongitude", None),
+    "Lugar": ("locationName", None),
+}
+
+# Campos de Garmin que solo se usan para calcular columnas derivadas
+CAMPOS_AUXILIARES = {
+    "duration": ("duration", None),
+    "running_cadence": ("averageRunningCadenceInStepsPerMinute", None),
+    "running_max_cadence": ("maxRunningCadenceInStepsPerMinute", None),
+    "bike_cadence": ("averageBikeCadence", None),
+    "bike_max_cadence": ("maxBikeCadence", None),
+}
+
+# Orden de las columnas del dataset
+COLUMNAS = [
+    "Activity ID", "Nombre de la Actividad", "Fecha de Inicio", "Deporte", "Duración (min)", "Distancia (m)",
+    "Ritmo medio (min/km)", "Velocidad media (m/s)", "Velocidad máxima (m/s)", "Calorías", "Tasa Metabólica Basal",
+    "Frecuencia Cardíaca Media", "Frecuencia Cardíaca Máxima", "Tiempo en Zona 1 (s)", "Tiempo en Zona 2 (s)",
+    "Tiempo en Zona 3 (s)", "Tiempo en Zona 4 (s)", "Tiempo en Zona 5 (s)", "VO2Max", "Cadencia Media (spm)",
+    "Cadencia Máxima (spm)", "Elevación Ganada (m)", "Elevación Perdida (m)", "Potencia Media (W)",
+    "Potencia Máxima (W)", "Temperatura (°C)", "Latitud", "Longitud", "Lugar",
+]
+
+# Columnas de texto; el resto de campos son numéricos
+CAMPOS_TEXTO = ["Nombre de la Actividad", "Fecha de Inicio", "Deporte", "Lugar"]
+
+# Convertir la lista de actividades en JSON de Garmin en un DataFrame.
+# El JSON se aplana una única vez (solo con los campos de las tablas) y las columnas derivadas
+# (duración, ritmo y cadencia según el deporte) se calculan con operaciones vectorizadas.
+def normalizar_actividades(activities):
+    campos = {**CAMPOS_GARMIN, **CAMPOS_AUXILIARES}
+    claves = list(dict.fromkeys(clave[0] if isinstance(clave, tuple) else clave for clave, _ in campos.values()))
+    # dtype=object evita que pandas infiera el tipo de cada columna: los numéricos se pasan a float después
+    plano = pd.DataFrame(activities, columns=claves, dtype=object)
+
+    columnas = {}
+    for col, (clave, defecto) in campos.items():
+        if isinstance(clave, tuple):
+            valores = plano[clave[0]].to_numpy()
+            for parte in clave[1:]:
+                valores = [v.get(parte) if isinstance(v, dict) else None for v in valores]
+            valores = np.array(valores, dtype=object)
+        else:
+            valores = plano[clave].to_numpy()
+        if col not in CAMPOS_TEXTO:
+            valores = valores.astype(float)
+            # Los campos ausentes (o nulos) toman el valor por defecto de la tabla
+            if defecto is not None:
+                valores[np.isnan(valores)] = defecto
+        columnas[col] = valores
+    raw = pd.DataFrame(columnas)
+
+    # Duración y distancia a 0 se tratan como ausentes, igual que en el cálculo original
+    duracion = raw["duration"].where(raw["duration"] != 0)
+    distancia = raw["Distancia (m)"].where(raw["Distancia (m)"] != 0)
+    raw["Duración (min)"] = duracion / 60
+    raw["Ritmo medio (min/km)"] = (duracion / 60) / (distancia / 1000)
+
+    # La cadencia es de carrera (pasos/min) en running y de pedaleo en el resto de deportes
+    es_running = raw["Deporte"] == "running"
+    raw["Cadencia Media (spm)"] = raw["running_cadence"].where(es_running, raw["bike_cadence"])
+    raw["Cadencia Máxima (spm)"] = raw["running_max_cadence"].where(es_running, raw["bike_max_cadence"])
+
+    return raw[COLUMNAS]
+
+# Actividades ya guardadas del usuario (None si todavía no ha descargado nada)
+def cargar_actividades_guardadas(user_id):
+    return leer_actividades(user_id)
+
+# Checkpoint de una sincronización en curso: cada página descargada se añade a la tabla
+# "descargas" del almacén (en una transacción, así que nunca queda a medio escribir) sin
+# reescribir las páginas anteriores
+def añadir_checkpoint(df, user_id):
+    almacen.añadir("descargas", user_id, tipar_actividades(df))
+
+# Actividades del checkpoint (None si no hay una sincronización a medias)
+def cargar_checkpoint(user_id):
+    df = almacen.leer("descargas", user_id)
+    return tipar_actividades(df) if df is not None else None
+
+# Descargar y normalizar una página de actividades, reintentando con espera exponencial si falla
+@cronometrado()
+def descargar_pagina(client, inicio, limite, reintentos=REINTENTOS, espera=ESPERA_REINTENTO):
+    for intento in range(reintentos + 1):
+        try:
+            pagina = client.get_activities(inicio, limite)
+            return normalizar_actividades(pagina), len(pagina)
+        except Exception:
+            if intento == reintentos:
+                raise
+            time.sleep(espera * 2 ** intento)
+
+# Sincronizar las actividades de Garmin del usuario de forma incremental.
+# Se recorren las páginas de la más reciente a la más antigua y se para al encontrar una actividad
+# ya guardada. Las páginas se piden en paralelo a un pool de hilos acotado y se procesan en orden
+# según llegan; tras cada página se guarda un checkpoint, de modo que si la descarga falla la
+# siguiente sincronización continúa desde ese punto. `progreso(descargadas, fraccion)` permite
+# mostrar el avance. Devuelve el DataFrame completo y el número de actividades nuevas.
+@cronometrado()
+def sincronizar_actividades(client, user_id, tam_pagina=TAM_PAGINA, max_actividades=MAX_ACTIVIDADES,
+                            max_workers=MAX_WORKERS, progreso=None):
+    retencion.registrar_uso(user_id)
+    guardadas = cargar_actividades_guardadas(user_id)
+    ids_guardados = set(guardadas["Activity ID"]) if guardadas is not None else set()
+
+    checkpoint = cargar_checkpoint(user_id)
+    # Páginas descargadas (se concatenan una sola vez al final)
+    paginas = [checkpoint] if checkpoint is not None else []
+
+    # Si ya hay datos guardados lo normal es que falte una sola página: no se piden páginas de más
+    if ids_guardados:
+        max_workers = 1
+
+    # Cada actividad descargada ocupa una fila, así que el checkpoint indica por dónde seguir
+    inicio = len(checkpoint) if checkpoint is not None else 0
+    descargadas = inicio
+    siguiente = inicio
+    pendientes = {}
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        while True:
+            # Mantener hasta `max_workers` páginas en vuelo por delante de la que toca procesar
+            while len(pendientes) < max_workers and siguiente < max_actividades:
+                limite = min(tam_pagina, max_actividades - siguiente)
+                pendientes[siguiente] = pool.submit(descargar_pagina, client, siguiente, limite)
+                siguiente += limite
+            if inicio not in pendientes:
+                break
+
+            df_pagina, n_pagina = pendientes.pop(inicio).result()
+            if n_pagina == 0:
+                break
+
+            conocidas = df_pagina["Activity ID"].isin(ids_guardados)
+            if conocidas.any():
+                # Quedarse solo con las actividades anteriores a la primera ya guardada
+                df_pagina = df_pagina.iloc[:conocidas.values.argmax()]
+
+            paginas.append(df_pagina)
+            añadir_checkpoint(df_pagina, user_id)
+            descargadas += len(df_pagina)
+            inicio += n_pagina
+            if progreso is not None:
+                progreso(descargadas, min(inicio / max_actividades, 1.0))
+
+            if conocidas.any() or n_pagina < tam_pagina:
+                break
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    # Fusionar lo descargado con lo que ya había, sin duplicados y de más reciente a más antigua
+    nuevas = pd.concat(paginas, ignore_index=True) if paginas else None
+    partes = [df for df in [nuevas, guardadas] if df is not None and len(df) > 0]
+    if partes:
+        df = tipar_actividades(pd.concat(partes, ignore_index=True))
+        df = df.drop_duplicates(subset="Activity ID", keep="first")
+        df = df.sort_values("Fecha de Inicio", ascending=False, kind="stable").reset_index(drop=True)
+    else:
+        df = normalizar_actividades([])
+    n_nuevas = len(df) - (len(guardadas) if guardadas is not None else 0)
+
+    if guardadas is None:
+        save_data(df, user_id)
+    elif nuevas is not None:
+        # Solo se escriben las actividades nuevas: el resto ya está guardado
+        añadir_actividades(nuevas.drop_duplicates(subset="Activity ID", keep="first"), user_id)
+    else:
+        retencion.registrar_uso(user_id)
+    # La carga de entrenamiento solo se recalcula desde el día de la actividad nueva más antigua
+    if nuevas is not None and len(nuevas) > 0:
+        carga.actualizar_carga(user_id, df, desde=carga.dias_actividades(nuevas).min())
+    almacen.borrar("descargas", user_id)
+    if progreso is not None:
+        progreso(len(nuevas) if nuevas is not None else 0, 1.0)
+    return df, n_nuevas
@@ -0,0 +1,245 @@
+import threading
+from collections import OrderedDict
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from pyecharts.charts import Bar, Calendar, Pie
+from pyecharts import options as opts
+from utils.renderizado import modo_render, reducir_serie, tipo_traza
+from utils.tiempos import cronometrado
+
+# Datos de los gráficos de la página de gráficos.
+# Se preparan de forma vectorizada y se guardan en una caché en memoria por usuario, versión del
+# dataset, año y tipo de agregación, de modo que cambiar el año o la agregación vuelve a servir los
+# datos ya calculados. Para el calendario se elige de forma determinista la actividad más larga
+# de cada día. Los gráficos (pyecharts y plotly) se construyen con las funciones figura_*, sin
+# Streamlit; la página solo los muestra.
+
+# Paleta de colores fija de los deportes
+PALETA = [
+    "#4E79A7",  # Azul
+    "#F28E2B",  # Naranja
+    "#E15759",  # Rojo
+    "#76B7B2",  # Verde azulado
+    "#59A14F",  # Verde
+    "#EDC949",  # Amarillo
+    "#AF7AA1",  # Púrpura
+    "#FF9DA7",  # Rosa claro
+    "#9C755F",  # Marrón
+    "#BAB0AC",  # Gris
+    "#86BCB6",  # Verde menta
+    "#F4A582",  # Naranja salmón
+    "#92C5DE",  # Azul cielo
+    "#D6604D",  # Rojo ladrillo
+    "#4393C3",  # Azul acero
+    "#B2182B",  # Rojo intenso
+    "#D4B9DA",  # Lila pastel
+    "#E6F598",  # Verde lima claro
+    "#999999",  # Gris neutro
+    "#D95F02",  # Naranja oscuro
+]
+
+# Columnas que usan los gráficos de dispersión y el mapa
+COLUMNAS_DISPERSION = [
+    "Deporte", "Nombre de la Actividad", "Distancia (m)", "Ritmo medio (min/km)", "Duración (min)",
+    "Calorías", "Frecuencia Cardíaca Media", "Frecuencia Cardíaca Máxima", "Latitud", "Longitud",
+]
+
+# Gráficos de dispersión de la página: nombre -> (eje x, eje y, datos al pasar el ratón, título)
+DISPERSIONES = {
+    "ritmo_distancia": ("Distancia (m)", "Ritmo medio (min/km)", ["Nombre de la Actividad", "Calorías", "Frecuencia Cardíaca Media"],
+                        "Relación entre Ritmo medio y Distancia"),
+    "fc_distancia": ("Distancia (m)", "Frecuencia Cardíaca Media", ["Nombre de la Actividad", "Calorías", "Frecuencia Cardíaca Media"],
+                     "Relación entre Frecuencia Media y Distancia"),
+    "duracion_calorias": ("Duración (min)", "Calorías", ["Nombre de la Actividad", "Calorías", "Duración (min)"],
+                          "Relación entre Duración y Calorías"),
+    "duracion_fc_maxima": ("Duración (min)", "Frecuencia Cardíaca Máxima", ["Nombre de la Actividad", "Frecuencia Cardíaca Máxima", "Duración (min)"],
+                           "Relación entre Duración y Frecuencia Cardíaca Máxima"),
+}
+
+# Número de entradas (datos generales, de un año o de una agregación) que se mantienen en memoria
+MAX_ENTRADAS = 256
+
+_entradas = OrderedDict()  # (user_id, versión, ...) -> datos
+_lock = threading.Lock()
+
+# Obtener unos datos de la caché o calcularlos con `calcular()` si no están. La clave empieza por
+# (user_id, versión); los datos del dataset de muestra se comparten entre todas las sesiones, así
+# que se guardan solo por versión.
+def _cacheado(clave, calcular):
+    user_id, version, *resto = clave
+    clave = (None if version == "muestra" else user_id, version, *resto)
+    with _lock:
+        if clave in _entradas:
+            _entradas.move_to_end(clave)
+            return _entradas[clave]
+    # El cálculo se hace fuera del lock para no bloquear al resto de sesiones
+    datos = calcular()
+    with _lock:
+        _entradas[clave] = datos
+        _entradas.move_to_end(clave)
+        while len(_entradas) > MAX_ENTRADAS:
+            _entradas.popitem(last=False)
+    return datos
+
+# Actividades con fecha y deporte ('Año' y 'Fecha' vienen calculadas al cargar los datos)
+def _validas(df):
+    return df.dropna(subset=["Fecha de Inicio", "Deporte"])
+
+# Una actividad por día: la más larga (a igualdad de duración, la primera del día)
+def actividad_por_dia(df):
+    ordenadas = df.sort_values(["Fecha", "Duración (min)", "Fecha de Inicio"], ascending=[True, False, True],
+                               na_position="last", kind="stable")
+    return ordenadas.drop_duplicates("Fecha")
+
+# Deportes del dataset completo con su color fijo, años disponibles y evolución del VO2Max
+# (reducida con LTTB si tiene demasiados puntos)
+@cronometrado()
+def datos_generales(user_id, version, df):
+    def calcular():
+        validas = _validas(df)
+        deportes = sorted(validas["Deporte"].unique())
+        vo2max = df.dropna(subset=["VO2Max"])
+        return {
+            "deportes": deportes,
+            "colores": {deporte: PALETA[i % len(PALETA)] for i, deporte in enumerate(deportes)},
+            "años": sorted(validas["Año"].unique(), reverse=True),
+            "vo2max": reducir_serie(vo2max[["Fecha de Inicio", "VO2Max"]], "Fecha de Inicio", ["VO2Max"]),
+        }
+    return _cacheado((user_id, version, "generales"), calcular)
+
+# Datos de un año: calendario, tarta, dispersión y mapa
+@cronometrado()
+def datos_año(user_id, version, df, año):
+    def calcular():
+        generales = datos_generales(user_id, version, df)
+        validas = _validas(df)
+        anual = validas[validas["Año"] == año]
+        diario = actividad_por_dia(anual)
+
+        # Calendario: [(día, índice del deporte + 1)] y una pieza por deporte del año, por orden de aparición
+        indices = pd.Categorical(diario["Deporte"], categories=generales["deportes"]).codes + 1
+        calendario = list(zip(diario["Fecha"].dt.strftime("%Y-%m-%d"), indices.tolist()))
+        piezas = [{"value": generales["deportes"].index(deporte) + 1, "label": deporte, "color": generales["colores"][deporte]}
+                  for deporte in diario["Deporte"].unique()]
+
+        # Tarta: días de entrenamiento de cada deporte
+        por_deporte = diario["Deporte"].value_counts().loc[lambda s: s > 0]
+        tarta = [[deporte, int(cantidad)] for deporte, cantidad in por_deporte.items()]
+
+        # Dispersión y mapa: todas las actividades del año
+        dispersion = anual[COLUMNAS_DISPERSION]
+        mapa = dispersion[["Latitud", "Longitud"]].apply(pd.to_numeric, errors="coerce").dropna()
+        return {
+            "calendario": calendario,
+            "piezas": piezas,
+            "tarta": tarta,
+            "colores_tarta": [generales["colores"][deporte] for deporte in por_deporte.index],
+            "dispersion": dispersion,
+            "mapa": mapa,
+        }
+    return _cacheado((user_id, version, "año", año), calcular)
+
+# Calorías totales o medias por deporte de un año: [(deporte, calorías, color)] de mayor a menor
+@cronometrado()
+def datos_barras(user_id, version, df, año, agregacion):
+    def calcular():
+        colores = datos_generales(user_id, version, df)["colores"]
+        anual = datos_año(user_id, version, df, año)["dispersion"]
+        por_deporte = anual.groupby("Deporte", observed=True)["Calorías"]
+        calorias = (por_deporte.sum() if agregacion == "Calorías totales" else por_deporte.mean()).sort_values(ascending=False)
+        return [(deporte, round(valor, 1), colores[deporte]) for deporte, valor in calorias.items()]
+    return _cacheado((user_id, version, "barras", año, agregacion), calcular)
+
+# Calendario del año con un color por deporte (una sola actividad por día, la más larga)
+def figura_calendario(datos, año):
+    return (
+        Calendar()
+        .add("", datos["calendario"], calendar_opts=opts.CalendarOpts(range_=[f"{año}-01-01", f"{año}-12-31"]))
+        .set_global_opts(
+            title_opts=opts.TitleOpts(title=f"Entrenamientos en {año}"),
+            visualmap_opts=opts.VisualMapOpts(is_piecewise=True,
+                                            pieces=datos["piezas"],
+                                            orient="horizontal",  
+                                            pos_bottom="0%",  
+                                            pos_left="center"),  
+        )
+    )
+
+# Tarta de días de entrenamiento de cada deporte del año, con los colores globales de los deportes
+def figura_tarta(datos, año):
+    return (
+        Pie()
+        .add(
+            "", 
+            datos["tarta"], 
+            radius=["40%", "70%"],  
+            rosetype="area",  
+        )
+        .set_colors(datos["colores_tarta"])  
+        .set_global_opts(
+            title_opts=opts.TitleOpts(title=f"Distribución de Entrenamientos en {año}"),
+            legend_opts=opts.LegendOpts(orient="horizontal", pos_bottom="-10%"),  # Leyenda en la parte inferior
+        )
+        .set_series_opts(
+            label_opts=opts.LabelOpts(
+                formatter="{b}: {c} ({d}%)",  
+                rich={
+                    "b": {"fontSize": 16, "fontWeight": "bold", "color": "#ffffff"},
+                    "c": {"fontSize": 14, "color": "#FFD700"},  
+                    "d": {"fontSize": 12, "color": "#FF6347"},  
+                }
+            )
+        )  
+    )
+
+# Barras de calorías por deporte (resultado de datos_barras), cada una con el color de su deporte
+def figura_barras(calorias_por_deporte, año, agregacion):
+    barras = [
+        opts.BarItem(
+            name=deporte,
+            value=calorias,
+            itemstyle_opts=opts.ItemStyleOpts(color=color)  # Asignar color a la barra
+        )
+        for deporte, calorias, color in calorias_por_deporte
+    ]
+    return (
+        Bar()
+        .add_xaxis([deporte for deporte, _, _ in calorias_por_deporte])  # Etiquetas de los deportes
+        .add_yaxis("Calorías Totales", barras, category_gap=0)  # Pasar las barras con los colores
+        .set_global_opts(
+            title_opts=opts.TitleOpts(title=f"{agregacion} en {año}"),
+            xaxis_opts=opts.AxisOpts(name="Deporte", axislabel_opts=opts.LabelOpts(rotate=-45)),
+            yaxis_opts=opts.AxisOpts(name="Calorías"),
+            legend_opts=opts.LegendOpts(orient="horizontal", pos_bottom="-10%"),  # Leyenda en la parte inferior
+            toolbox_opts=opts.ToolboxOpts(is_show=True, orient="horizontal", pos_top="0%"),
+        )
+    )
+
+# Gráfico de dispersión `nombre` de DISPERSIONES con las actividades del año, con los colores
+# globales de los deportes y WebGL si hay muchos puntos
+def figura_dispersion(datos, colores, nombre):
+    x, y, hover_data, titulo = DISPERSIONES[nombre]
+    dispersion = datos["dispersion"]
+    return px.scatter(
+        dispersion, 
+        x=x, 
+        y=y, 
+        color="Deporte",  # Usa el mismo esquema de colores
+        color_discrete_map=colores,  # Aplica el mapeo de colores
+        render_mode=modo_render(len(dispersion)),  # WebGL con muchos puntos
+        hover_data=hover_data, 
+        title=titulo,
+        labels={x: x, y: y},
+    )
+
+# Evolución del VO2Max (serie ya reducida con LTTB si es muy larga)
+def figura_vo2max(vo2max):
+    fig = go.Figure()
+    fig.add_trace(tipo_traza(len(vo2max))(
+        x=vo2max['Fecha de Inicio'],
+        y=vo2max['VO2Max'],
+        mode='lines+markers',  # Esto especifica tanto líneas como marcadores
+        name='VO2Max'
+    ))
+    return fig
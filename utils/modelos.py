@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import joblib
+import pandas as pd
+
+# Almacén local de modelos entrenados.
+# Cada modelo se guarda con una clave que combina la huella de los datos de entrenamiento y la
+# configuración de la búsqueda, de modo que solo se reentrena cuando alguna de las dos cambia.
+# Los modelos tienen un propietario (el usuario cuyos datos se han usado, o "muestra" para el
+# dataset de muestra): cada usuario solo ve y purga los suyos, y se eliminan cuando caducan sus datos.
+
+MODELOS_DIR = os.path.join("data", "modelos")
+EDAD_MAXIMA_DIAS = 30
+TAMANO_MAXIMO_MB = 500
+
+_lock = threading.Lock()
+
+# Huella de un DataFrame de entrenamiento, de la configuración con la que se entrena y de su
+# propietario (dos usuarios con los mismos datos no comparten modelos)
+def huella(df, configuracion, propietario=None):
+    h = hashlib.sha256()
+    if propietario is not None:
+        h.update(f"{propietario}\0".encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    h.update(",".join(map(str, df.columns)).encode("utf-8"))
+    h.update(json.dumps(configuracion, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()[:32]
+
+# Huella solo de la configuración: identifica los modelos entrenados de la misma forma aunque
+# con datos distintos (p. ej. para actualizarlos en lugar de entrenarlos de cero)
+def huella_configuracion(configuracion):
+    return hashlib.sha256(json.dumps(configuracion, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:32]
+
+def _rutas(clave):
+    return os.path.join(MODELOS_DIR, f"{clave}.joblib"), os.path.join(MODELOS_DIR, f"{clave}.json")
+
+# Guardar un modelo (cualquier objeto serializable con joblib) junto con sus metadatos
+def guardar_modelo(clave, modelo, metadatos=None, propietario=None):
+    os.makedirs(MODELOS_DIR, exist_ok=True)
+    ruta_modelo, ruta_meta = _rutas(clave)
+    tmp = f"{ruta_modelo}.{threading.get_ident()}.tmp"
+    joblib.dump(modelo, tmp)
+    os.replace(tmp, ruta_modelo)
+
+    meta = {"clave": clave, "propietario": propietario, "creado": time.time(), "tamano_bytes": os.path.getsize(ruta_modelo)}
+    meta.update(metadatos or {})
+    with open(ruta_meta, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, default=str)
+    purgar_modelos(propietario)
+
+# Cargar un modelo del almacén (None si no existe o no se puede leer)
+def cargar_modelo(clave):
+    ruta_modelo, _ = _rutas(clave)
+    if not os.path.exists(ruta_modelo):
+        return None
+    try:
+        modelo = joblib.load(ruta_modelo)
+    except Exception:
+        return None
+    # Marcar el último uso para que la purga por tamaño elimine antes los menos usados
+    os.utime(ruta_modelo)
+    return modelo
+
+# Instante en que se guardó un modelo (None si no existe o sus metadatos no se pueden leer)
+def creado_modelo(clave):
+    try:
+        with open(_rutas(clave)[1], encoding="utf-8") as f:
+            return json.load(f)["creado"]
+    except Exception:
+        return None
+
+# Listar los modelos guardados con sus metadatos, del más reciente al más antiguo (solo los de
+# `propietario` si se indica)
+def listar_modelos(propietario=None):
+    if not os.path.isdir(MODELOS_DIR):
+        return pd.DataFrame()
+    filas = []
+    for archivo in os.listdir(MODELOS_DIR):
+        if not archivo.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(MODELOS_DIR, archivo), encoding="utf-8") as f:
+                meta = json.load(f)
+        except Exception:
+            continue
+        if propietario is not None and meta.get("propietario") != propietario:
+            continue
+        ruta_modelo, _ = _rutas(meta["clave"])
+        if os.path.exists(ruta_modelo):
+            meta["ultimo_uso"] = os.path.getmtime(ruta_modelo)
+            filas.append(meta)
+    if not filas:
+        return pd.DataFrame()
+    df = pd.DataFrame(filas).sort_values("creado", ascending=False).reset_index(drop=True)
+    for col in ["creado", "ultimo_uso"]:
+        df[col] = pd.to_datetime(df[col], unit="s")
+    return df
+
+# Eliminar un modelo del almacén
+def eliminar_modelo(clave):
+    for ruta in _rutas(clave):
+        if os.path.exists(ruta):
+            os.remove(ruta)
+
+# Eliminar todos los modelos de un propietario (p. ej. cuando caducan sus datos)
+def eliminar_modelos(propietario):
+    with _lock:
+        modelos = listar_modelos(propietario)
+        eliminados = list(modelos["clave"]) if not modelos.empty else []
+        for clave in eliminados:
+            eliminar_modelo(clave)
+        return eliminados
+
+# Eliminar los modelos de `propietario` (o de todos si no se indica) con más de `edad_maxima_dias`
+# y, si ocupan más de `tamano_maximo_mb`, los usados hace más tiempo hasta volver por debajo del límite
+def purgar_modelos(propietario=None, edad_maxima_dias=EDAD_MAXIMA_DIAS, tamano_maximo_mb=TAMANO_MAXIMO_MB):
+    with _lock:
+        modelos = listar_modelos(propietario)
+        if modelos.empty:
+            return []
+        ahora = pd.Timestamp(time.time(), unit="s")
+        caducados = modelos["creado"] < ahora - pd.Timedelta(days=edad_maxima_dias)
+        eliminados = list(modelos.loc[caducados, "clave"])
+
+        restantes = modelos[~caducados].sort_values("ultimo_uso", ascending=False)
+        acumulado = restantes["tamano_bytes"].cumsum()
+        eliminados += list(restantes.loc[acumulado > tamano_maximo_mb * 1024 * 1024, "clave"])
+
+        for clave in eliminados:
+            eliminar_modelo(clave)
+        return eliminados
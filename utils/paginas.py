@@ -0,0 +1,40 @@
+import importlib
+import logging
+import sys
+import threading
+import time
+
+# Registro de páginas de la aplicación: nombre en el menú -> (módulo, función de la página, icono).
+# Los módulos de cada página (y sus dependencias pesadas: xgboost, lightgbm, pyecharts...)
+# solo se importan la primera vez que se selecciona la página.
+PAGINAS = {
+    "Home": ("navigation.home", "home_page", "house"),
+    "Gráficos": ("navigation.graficos", "graficos_page", "bar-chart"),
+    "Predicciones de carrera": ("navigation.predicciones", "predicciones_page", "trophy"),
+    "Detección de anomalías": ("navigation.anomalias", "anomalias_page", "lightbulb"),
+    "Clustering de entrenamientos": ("navigation.clustering", "clustering_page", "diagram-3"),
+    "Carga semanal de entrenamientos": ("navigation.volumen", "volumen_semanal_page", "calendar-week"),
+}
+
+_tiempos_importacion = {}  # módulo -> {"segundos": ..., "modulos_nuevos": ...}
+_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+# Obtener la función de una página, importando su módulo solo si todavía no se ha hecho
+def cargar_pagina(nombre):
+    modulo, funcion, _ = PAGINAS[nombre]
+    with _lock:
+        if modulo not in sys.modules:
+            modulos_antes = len(sys.modules)
+            inicio = time.perf_counter()
+            importlib.import_module(modulo)
+            segundos = time.perf_counter() - inicio
+            _tiempos_importacion[modulo] = {"segundos": segundos, "modulos_nuevos": len(sys.modules) - modulos_antes}
+            logger.info(f"Página '{nombre}' importada en {segundos:.2f} s ({len(sys.modules) - modulos_antes} módulos nuevos)")
+    return getattr(sys.modules[modulo], funcion)
+
+# Informe de lo que ha costado importar cada página en este proceso
+def informe_importaciones():
+    with _lock:
+        return {modulo: dict(datos) for modulo, datos in _tiempos_importacion.items()}
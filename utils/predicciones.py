@@ -0,0 +1,386 @@
+import os
+import numpy as np
+import pandas as pd
+import plotly.express as px
+from sklearn.model_selection import train_test_split
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+from sklearn.linear_model import Lasso, ElasticNet
+from sklearn.metrics import mean_absolute_error
+from sklearn.preprocessing import RobustScaler
+from sklearn.impute import SimpleImputer
+from utils import modelos as almacen_modelos
+from utils.data_manager import propietario_datos
+from utils.entrenamiento import busqueda_paralela, busqueda_halving, apilar_modelos, continuar_modelos, EnsembleApilado
+from utils.tiempos import cronometrado
+from xgboost import XGBRegressor  
+import lightgbm as lgb
+
+# Predicción de tiempos de carrera (cálculo de la página de predicciones, sin Streamlit).
+# El avance del entrenamiento se comunica con un callback `progreso(fraccion, texto)`, de modo que
+# el mismo código se puede ejecutar desde la página, en otro proceso o en los benchmarks.
+
+# Características predictoras (sin incluir la variable a predecir: velocidad)
+FEATURES = ['Distancia (m)', 'Elevación Ganada (m)', 'Frecuencia Cardíaca Media', 'Frecuencia Cardíaca Máxima', 'Hora del Día', 'Pendiente', 'VO2Max', 'Cadencia Media (spm)']
+OBJETIVO = 'Velocidad media (m/s)'
+
+# Modelos a entrenar
+def crear_modelos():
+    return {
+        "RandomForest": RandomForestRegressor(),
+        "GradientBoosting": GradientBoostingRegressor(),
+        "XGBoost": XGBRegressor(),
+        "Lasso": Lasso(alpha=0.1),
+        "ElasticNet": ElasticNet(alpha=0.1, l1_ratio=0.5),  # Ajustar l1_ratio si es necesario
+        "LightGBM": lgb.LGBMRegressor()
+    }
+
+# Espacio de búsqueda de hiperparámetros
+PARAM_DISTRIBUTIONS = {
+    "RandomForest": {"n_estimators": [50, 100, 200], "max_depth": [10, 20, None], "min_samples_split": [2, 5, 10]},
+    "GradientBoosting": {"n_estimators": [100, 200], "learning_rate": [0.1, 0.2], "max_depth": [5, 10]},
+    "XGBoost": {"n_estimators": [50, 100], "learning_rate": [0.1, 0.2], "max_depth": [5, 10]},
+    "Lasso": {"alpha": [0.01, 0.1, 1.0, 10]},
+    "ElasticNet": {"alpha": [0.01, 0.1, 1.0], "l1_ratio": [0.2, 0.5, 0.8]},
+    "LightGBM": {"n_estimators": [50, 100, 200], "learning_rate": [0.01, 0.1, 0.2], "max_depth": [3, 5, 10]}
+}
+
+# Modos de búsqueda de hiperparámetros
+MODO_ALEATORIA = "Aleatoria (5 combinaciones por modelo)"
+MODO_HALVING = "Con presupuesto de tiempo (successive halving)"
+
+# Presupuesto de tiempo por defecto (segundos) para la búsqueda con successive halving
+PRESUPUESTO_SEGUNDOS = int(os.environ.get("GARMIN_PRESUPUESTO_PREDICCION", "60"))
+
+# Carreras mínimas para entrenar los modelos
+MIN_CARRERAS = 50
+
+# Rangos de distancia (m) en los que se buscan las mejores marcas personales
+RANGOS_MARCAS = {"5K": (4900, 5100), "10K": (9900, 10100), "21K": (20900, 21300), "42K": (41900, 42100)}
+
+# Fórmula de Riegel: T2 = T1 * (D2 / D1) ** 1.06, tomando como referencia el tiempo de 5K
+EXPONENTE_RIEGEL = 1.06
+DISTANCIA_RIEGEL = 5000
+
+# Actualización incremental: si las carreras nuevas superan esta fracción de las ya usadas para
+# entrenar, o si el modelo anterior predice las carreras nuevas con un MAE mayor que UMBRAL_DERIVA
+# veces su MAE en test, se considera que los datos han cambiado y se entrena desde cero
+FRACCION_MAXIMA_NUEVAS = 0.25
+UMBRAL_DERIVA = 1.5
+
+# Actualizaciones incrementales encadenadas como máximo: cada una añade árboles (o rondas de
+# boosting) a los modelos y mantiene los hiperparámetros y el estimador final del Ensemble, así
+# que pasado este número se vuelve a entrenar desde cero
+MAX_INCREMENTOS = 5
+
+# Columna del MAE de validación cruzada en la tabla de comparación. Tras una actualización
+# incremental no se vuelve a validar: el MAE es el de la última búsqueda completa y así se indica.
+COLUMNA_MAE_TRAIN = 'MAE Train'
+COLUMNA_MAE_TRAIN_INCREMENTAL = 'MAE Train (última búsqueda completa)'
+
+# Origen de los modelos mostrados en la página
+ORIGEN_ALMACEN = "almacen"
+ORIGEN_INCREMENTAL = "incremental"
+ORIGEN_COMPLETO = "completo"
+
+# Configuración de la búsqueda: forma parte de la clave del modelo guardado, así que cualquier
+# cambio aquí provoca un reentrenamiento
+def configuracion_busqueda(modo=MODO_HALVING, presupuesto_segundos=PRESUPUESTO_SEGUNDOS):
+    config = {
+        "features": FEATURES,
+        "objetivo": OBJETIVO,
+        "param_distributions": PARAM_DISTRIBUTIONS,
+        "modo": modo,
+        "cv": 3,
+        "test_size": 0.2,
+        "random_state": 42,
+    }
+    if modo == MODO_HALVING:
+        config.update({"presupuesto_segundos": presupuesto_segundos, "n_candidatos": 9, "factor": 3})
+    else:
+        config.update({"n_iter": 5})
+    return config
+
+# Filtrar las actividades de carrera. Las variables derivadas ('Hora del Día' y 'Pendiente',
+# la relación entre Elevación Ganada y Distancia) vienen calculadas al cargar los datos.
+def preparar_datos(df):
+    # Filtrar datos solo para 'running'
+    return df[df['Deporte'] == 'running']
+
+# Evaluar en test los modelos ya ajustados y el Ensemble, y elegir el modelo final.
+# Devuelve el diccionario que se guarda en el almacén: todo lo necesario para predecir (imputador,
+# escalado y modelo), las métricas de la comparación y lo necesario para actualizar después los
+# modelos de forma incremental (modelos base, Ensemble y Activity ID de entrenamiento y test).
+# `columna_train` es el nombre de la columna del MAE de validación cruzada en la comparación.
+def evaluar_modelos(imputer, scaler, best_models, best_scores, ensemble_model, mae_ensemble_train,
+                    X_test, y_test, ids_entrenamiento, ids_test, X_mean, columna_train=COLUMNA_MAE_TRAIN):
+    # Comparación de modelos usando el conjunto de test: cada modelo predice el test una sola vez
+    mae_df = pd.DataFrame.from_dict(best_scores, orient='index', columns=[columna_train]).reset_index()
+    mae_df.rename(columns={'index': 'Modelo'}, inplace=True)
+    predicciones_test = {name: modelo.predict(X_test) for name, modelo in best_models.items()}
+    mae_test = {name: mean_absolute_error(y_test, y_pred) for name, y_pred in predicciones_test.items()}
+    best_model_names = list(ensemble_model.estimadores)
+
+    # Mejor modelo individual (el que tiene el menor MAE en validación cruzada)
+    best_model_name = min(best_scores, key=best_scores.get)
+    mae_best_model = mae_test[best_model_name]
+
+    # MAE del Ensemble en test, combinando las predicciones de test ya calculadas
+    y_pred_ensemble = ensemble_model.combinar(np.column_stack([predicciones_test[name] for name in best_model_names]))
+    mae_ensemble = mean_absolute_error(y_test, y_pred_ensemble)
+
+    # Agregar los resultados al DataFrame para comparación
+    mae_df['MAE Test'] = mae_df['Modelo'].map(mae_test)
+
+    # Agregar el MAE del Ensemble (stacking) al DataFrame para test y train
+    ensemble_name = f"Ensemble (Stacking) - Modelos: {', '.join(best_model_names)}"
+    mae_df.loc[len(mae_df)] = [ensemble_name, mae_ensemble_train, mae_ensemble]  # Añadir fila del Ensemble
+
+    # El mejor modelo individual se usa como final si mejora al Ensemble en test
+    usa_ensemble = not mae_best_model < mae_ensemble
+    return {
+        "imputer": imputer,
+        "scaler": scaler,
+        "final_model": ensemble_model if usa_ensemble else best_models[best_model_name],
+        "usa_ensemble": usa_ensemble,
+        "best_model_name": best_model_name,
+        "best_model_names": best_model_names,
+        "mae_best_model": mae_best_model,
+        "mae_ensemble": mae_ensemble,
+        "mae_df": mae_df,
+        "X_mean": X_mean,
+        "best_models": best_models,
+        "best_scores": best_scores,
+        "ensemble_model": ensemble_model,
+        "mae_ensemble_train": mae_ensemble_train,
+        "ids_entrenamiento": ids_entrenamiento,
+        "ids_test": ids_test,
+    }
+
+# Entrenar los modelos desde cero: búsqueda de hiperparámetros, Ensemble y evaluación en test.
+# `progreso(fraccion, texto)` permite informar del avance del entrenamiento.
+def entrenar_modelos(df, config, progreso=None):
+    X = df[FEATURES]
+    y = df[OBJETIVO]
+
+    # Imputación de valores faltantes
+    imputer = SimpleImputer(strategy='median')
+    X_imputed = imputer.fit_transform(X)
+
+    # Escalado de características
+    scaler = RobustScaler()
+    X_scaled = scaler.fit_transform(X_imputed)
+
+    # División de datos en entrenamiento y prueba
+    X_train, X_test, y_train, y_test, ids_train, ids_test = train_test_split(
+        X_scaled, y, df['Activity ID'].to_numpy(), test_size=config["test_size"], random_state=config["random_state"]
+    )
+
+    # Búsqueda de hiperparámetros de todos los modelos en paralelo
+    if config["modo"] == MODO_HALVING:
+        best_models, best_scores, _, predicciones_oof = busqueda_halving(
+            crear_modelos(), config["param_distributions"], X_train, y_train,
+            presupuesto_segundos=config["presupuesto_segundos"], n_candidatos=config["n_candidatos"],
+            factor=config["factor"], cv=config["cv"], random_state=config["random_state"], progreso=progreso
+        )
+    else:
+        best_models, best_scores, _, predicciones_oof = busqueda_paralela(
+            crear_modelos(), config["param_distributions"], X_train, y_train,
+            n_iter=config["n_iter"], cv=config["cv"], random_state=config["random_state"], progreso=progreso
+        )
+
+    if progreso is not None:
+        progreso(1.0, "Entrenamiento completado.")
+
+    # Selección de los tres mejores modelos según el MAE en validación cruzada
+    sorted_models = sorted(best_scores.items(), key=lambda x: x[1])[:3]
+    best_model_names = [model[0] for model in sorted_models]
+    best_models_for_stacking = {name: best_models[name] for name in best_model_names}
+
+    # Modelo final con Stacking usando solo los tres mejores modelos: el estimador final (Ridge)
+    # se entrena con las predicciones fuera de fold de la búsqueda, sin reajustar los modelos base
+    ensemble_model = apilar_modelos(best_models_for_stacking, predicciones_oof, y_train)
+
+    # MAE del Ensemble en train, con las predicciones fuera de fold (comparable al MAE de validación
+    # cruzada del resto de modelos)
+    y_pred_ensemble_train = ensemble_model.combinar(np.column_stack([predicciones_oof[name] for name in best_model_names]))
+    mae_ensemble_train = mean_absolute_error(y_train, y_pred_ensemble_train)
+
+    return evaluar_modelos(imputer, scaler, best_models, best_scores, ensemble_model, mae_ensemble_train,
+                           X_test, y_test, ids_train, ids_test, X.mean())
+
+# Actualizar de forma incremental unos modelos ya entrenados con las carreras nuevas.
+# Se reutilizan el imputador, el escalado, los hiperparámetros y el estimador final del Ensemble
+# del entrenamiento anterior; los modelos base continúan su entrenamiento con todas las carreras
+# de entrenamiento. Las carreras nuevas se reparten entre entrenamiento y test en la misma
+# proporción que en el entrenamiento completo, y las de test anteriores siguen en test.
+# Devuelve None si la comprobación de deriva o el número de actualizaciones encadenadas aconsejan
+# entrenar desde cero.
+def actualizar_modelos(df, previo, config, progreso=None):
+    incrementos = previo.get("incrementos", 0) + 1
+    if incrementos > MAX_INCREMENTOS:
+        return None
+    ids = df['Activity ID'].to_numpy()
+    es_nueva = ~np.isin(ids, np.concatenate([previo["ids_entrenamiento"], previo["ids_test"]]))
+    n_nuevas = int(es_nueva.sum())
+    if n_nuevas == 0 or n_nuevas > FRACCION_MAXIMA_NUEVAS * len(previo["ids_entrenamiento"]):
+        return None
+
+    X_scaled = previo["scaler"].transform(previo["imputer"].transform(df[FEATURES]))
+    y = df[OBJETIVO].to_numpy()
+
+    # Comprobación de deriva: error del modelo anterior en las carreras nuevas
+    mae_previo = previo["mae_ensemble"] if previo["usa_ensemble"] else previo["mae_best_model"]
+    mae_nuevas = mean_absolute_error(y[es_nueva], previo["final_model"].predict(X_scaled[es_nueva]))
+    if mae_nuevas > UMBRAL_DERIVA * mae_previo:
+        return None
+
+    # Reparto de las carreras nuevas entre entrenamiento y test
+    nuevas = np.flatnonzero(es_nueva)
+    nuevas = nuevas[np.random.RandomState(config["random_state"]).permutation(len(nuevas))]
+    n_test = int(len(nuevas) * config["test_size"])
+    es_test = np.isin(ids, previo["ids_test"])
+    es_test[nuevas[:n_test]] = True
+
+    completados = [0]
+    def al_completar(name):
+        completados[0] += 1
+        if progreso is not None:
+            progreso(completados[0] / len(previo["best_models"]), f"Actualizando modelo {name}...")
+    best_models = continuar_modelos(previo["best_models"], X_scaled[~es_test], y[~es_test], al_completar=al_completar)
+    if progreso is not None:
+        progreso(1.0, "Actualización completada.")
+
+    ensemble_model = EnsembleApilado({name: best_models[name] for name in previo["ensemble_model"].estimadores},
+                                     previo["ensemble_model"].final_estimator)
+    resultado = evaluar_modelos(previo["imputer"], previo["scaler"], best_models, previo["best_scores"], ensemble_model,
+                                previo["mae_ensemble_train"], X_scaled[es_test], y[es_test],
+                                ids[~es_test], ids[es_test], df[FEATURES].mean(),
+                                columna_train=COLUMNA_MAE_TRAIN_INCREMENTAL)
+    resultado["incrementos"] = incrementos
+    return resultado
+
+# Buscar entre los modelos de `propietario` el entrenamiento más reciente con la misma
+# configuración cuyas carreras estén todas en los datos actuales (es decir, el usuario solo ha
+# añadido carreras nuevas)
+def buscar_modelo_previo(df, config, propietario):
+    modelos = almacen_modelos.listar_modelos(propietario)
+    if modelos.empty or "huella_configuracion" not in modelos:
+        return None, None
+    candidatos = modelos[(modelos["huella_configuracion"] == almacen_modelos.huella_configuracion(config))
+                         & (modelos["registros"] < len(df))]
+    ids = df['Activity ID'].to_numpy()
+    for clave in candidatos["clave"].head(3):
+        previo = almacen_modelos.cargar_modelo(clave)
+        if previo is None or "best_models" not in previo:
+            continue
+        if np.isin(np.concatenate([previo["ids_entrenamiento"], previo["ids_test"]]), ids).all():
+            return clave, previo
+    return None, None
+
+# Obtener los modelos entrenados del almacén, actualizarlos con las carreras nuevas o entrenarlos
+# desde cero si los datos o la configuración han cambiado. Los modelos se guardan a nombre del
+# propietario de los datos de `user_id`. Devuelve el resultado y su origen.
+@cronometrado()
+def obtener_modelos(df, config, user_id, progreso=None):
+    propietario = propietario_datos(user_id)
+    clave = almacen_modelos.huella(df[FEATURES + [OBJETIVO]], config, propietario)
+    resultado = almacen_modelos.cargar_modelo(clave)
+    if resultado is not None:
+        return resultado, ORIGEN_ALMACEN
+
+    clave_previa, previo = buscar_modelo_previo(df, config, propietario)
+    resultado = actualizar_modelos(df, previo, config, progreso) if previo is not None else None
+    origen = ORIGEN_INCREMENTAL if resultado is not None else ORIGEN_COMPLETO
+    if resultado is None:
+        resultado = entrenar_modelos(df, config, progreso)
+
+    metadatos = {
+        "tipo": "prediccion_carrera",
+        "busqueda": config["modo"],
+        "huella_configuracion": almacen_modelos.huella_configuracion(config),
+        "entrenamiento": origen,
+        "modelo_base": clave_previa if origen == ORIGEN_INCREMENTAL else None,
+        "incrementos": resultado.get("incrementos", 0),
+        "registros": len(df),
+        "modelo_final": f"Ensemble ({', '.join(resultado['best_model_names'])})" if resultado["usa_ensemble"] else resultado["best_model_name"],
+        "mae_test": resultado["mae_ensemble"] if resultado["usa_ensemble"] else resultado["mae_best_model"],
+    }
+    almacen_modelos.guardar_modelo(clave, resultado, metadatos, propietario)
+    return resultado, origen
+
+# Mejores tiempos históricos (s) en cada rango de RANGOS_MARCAS (NaN si no hay ninguna carrera)
+def mejores_marcas(df):
+    distancia = df['Distancia (m)'].to_numpy(dtype=float)[:, None]
+    segundos = df['Duración (min)'].to_numpy(dtype=float)[:, None] * 60
+    limites = np.array(list(RANGOS_MARCAS.values()), dtype=float)
+    en_rango = (distancia >= limites[:, 0]) & (distancia <= limites[:, 1])
+    return pd.Series(np.fmin.reduce(np.where(en_rango, segundos, np.nan), axis=0, initial=np.nan), index=list(RANGOS_MARCAS))
+
+# Limitar cada tiempo estimado con la mejor marca personal del rango en el que cae su distancia
+def limitar_con_marcas(distancias, tiempos, marcas):
+    limites = np.array([RANGOS_MARCAS[nombre] for nombre in marcas.index], dtype=float)
+    en_rango = (distancias[:, None] >= limites[:, 0]) & (distancias[:, None] <= limites[:, 1])
+    marca = np.fmin.reduce(np.where(en_rango, marcas.to_numpy(dtype=float), np.nan), axis=1, initial=np.nan)
+    return np.fmin(tiempos, marca)
+
+# Predecir tiempos de carrera para una lista de distancias (m) con una sola llamada al modelo.
+# Cada fila parte de la media histórica de las características, con su distancia y el desnivel
+# que corresponde a la pendiente media; `escenario` permite fijar otros valores de las
+# características (p. ej. {"Pendiente": 0.01, "Frecuencia Cardíaca Media": 150}).
+# Los tiempos del modelo y los de Riegel (a partir del 5K estimado) se limitan con las mejores
+# marcas personales. Devuelve una fila por distancia con tiempos en segundos y ritmos en min/km.
+@cronometrado()
+def predecir_curva(resultado, df, distancias, escenario=None):
+    distancias = np.asarray(distancias, dtype=float)
+    base = df[FEATURES].mean()
+    if escenario:
+        base.update(pd.Series(escenario, dtype=float))
+
+    # La distancia de referencia de Riegel se predice en el mismo lote que el resto
+    todas = np.append(distancias, DISTANCIA_RIEGEL)
+    X = pd.DataFrame(np.tile(base.to_numpy(dtype=float), (len(todas), 1)), columns=FEATURES)
+    X['Distancia (m)'] = todas
+    X['Elevación Ganada (m)'] = base['Pendiente'] * todas
+    X_scaled = resultado["scaler"].transform(resultado["imputer"].transform(X))
+    velocidad = resultado["final_model"].predict(X_scaled)
+
+    marcas = mejores_marcas(df)
+    tiempo = limitar_con_marcas(todas, todas / velocidad, marcas)
+    tiempo_riegel = limitar_con_marcas(distancias, tiempo[-1] * (distancias / DISTANCIA_RIEGEL) ** EXPONENTE_RIEGEL, marcas)
+    tiempo = tiempo[:-1]
+
+    return pd.DataFrame({
+        "Distancia (km)": distancias / 1000,
+        "Velocidad (m/s)": velocidad[:-1],
+        "Tiempo (s)": tiempo,
+        "Ritmo (min/km)": tiempo / 60 / (distancias / 1000),
+        "Tiempo Riegel (s)": tiempo_riegel,
+        "Ritmo Riegel (min/km)": tiempo_riegel / 60 / (distancias / 1000),
+    })
+
+# Convertir segundos en horas y minutos
+def segundos_a_horas_minutos(tiempo_segundos):
+    horas = int(tiempo_segundos // 3600)
+    minutos = int((tiempo_segundos % 3600) // 60)
+    return horas, minutos
+
+# Escenario por defecto de la curva de tiempos: desnivel medio (m por km) y frecuencia cardíaca
+# media de las carreras, dentro de los rangos de los sliders de la página
+def escenario_medio(df):
+    desnivel = int(np.clip(np.nan_to_num(df['Pendiente'].mean()) * 1000, 0, 100))
+    fc_media = int(np.clip(np.nan_to_num(df['Frecuencia Cardíaca Media'].mean(), nan=150), 100, 200))
+    return desnivel, fc_media
+
+# Curva de tiempos estimados de 1 a 50 km (modelo y Riegel) para un escenario de desnivel (m por
+# km) y frecuencia cardíaca media
+@cronometrado()
+def figura_curva(resultado, df, desnivel, fc_media):
+    curva = predecir_curva(resultado, df, np.arange(1000, 50001, 500),
+                           escenario={"Pendiente": desnivel / 1000, "Frecuencia Cardíaca Media": fc_media})
+    curva_larga = pd.concat([
+        curva.assign(Estimación="Modelo", **{"Tiempo (min)": curva["Tiempo (s)"] / 60}),
+        curva.assign(Estimación="Riegel", **{"Tiempo (min)": curva["Tiempo Riegel (s)"] / 60,
+                                             "Ritmo (min/km)": curva["Ritmo Riegel (min/km)"]}),
+    ])
+    return px.line(curva_larga, x="Distancia (km)", y="Tiempo (min)", color="Estimación",
+                   hover_data={"Ritmo (min/km)": ":.2f", "Tiempo (min)": ":.1f"})
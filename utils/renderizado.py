@@ -0,0 +1,63 @@
+import os
+import numpy as np
+import plotly.graph_objects as go
+
+# Renderizado de gráficos grandes.
+# Por encima de UMBRAL_WEBGL puntos los gráficos de dispersión y de líneas se dibujan con WebGL en
+# lugar de SVG, y las series temporales largas se reducen a MAX_PUNTOS_SERIE puntos con LTTB
+# (Largest-Triangle-Three-Buckets), que conserva los picos y la forma de la serie.
+
+# Número de puntos a partir del cual se usa WebGL, configurable por variable de entorno
+UMBRAL_WEBGL = int(os.environ.get("GARMIN_UMBRAL_WEBGL", "1000"))
+
+# Puntos máximos de cada serie temporal que se envían al navegador
+MAX_PUNTOS_SERIE = int(os.environ.get("GARMIN_MAX_PUNTOS_SERIE", "1000"))
+
+# Modo de renderizado de plotly express (render_mode) para un gráfico de `n_puntos` puntos
+def modo_render(n_puntos):
+    return "webgl" if n_puntos > UMBRAL_WEBGL else "svg"
+
+# Tipo de traza de plotly (go.Scatter o go.Scattergl) para una serie de `n_puntos` puntos
+def tipo_traza(n_puntos):
+    return go.Scattergl if n_puntos > UMBRAL_WEBGL else go.Scatter
+
+# Valores numéricos del eje x (las fechas se pasan a nanosegundos)
+def _numerico(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype("datetime64[ns]").astype("int64").astype(float)
+    return x.astype(float)
+
+# Índices de los `n_puntos` puntos que elige LTTB de una serie (x ordenada de menor a mayor).
+# El primer y el último punto se conservan siempre; del resto se reparte la serie en n_puntos - 2
+# tramos y de cada uno se elige el punto que forma el triángulo de mayor área con el punto elegido
+# en el tramo anterior y la media del tramo siguiente.
+def lttb(x, y, n_puntos):
+    n = len(x)
+    if n_puntos >= n or n_puntos < 3:
+        return np.arange(n)
+    x = _numerico(x)
+    y = np.asarray(y, dtype=float)
+    bordes = np.linspace(1, n - 1, n_puntos - 1).astype(int)
+    indices = np.empty(n_puntos, dtype=np.intp)
+    indices[0], indices[-1] = 0, n - 1
+    anterior = 0
+    for i in range(n_puntos - 2):
+        inicio, fin = bordes[i], bordes[i + 1]
+        siguiente = slice(fin, bordes[i + 2] if i + 2 < len(bordes) else n)
+        x_media, y_media = x[siguiente].mean(), y[siguiente].mean()
+        areas = np.abs((x[anterior] - x_media) * (y[inicio:fin] - y[anterior])
+                       - (x[anterior] - x[inicio:fin]) * (y_media - y[anterior]))
+        anterior = inicio + int(np.argmax(areas))
+        indices[i + 1] = anterior
+    return indices
+
+# Reducir una serie temporal a como mucho `max_puntos` puntos por columna, ordenada por `x`.
+# Con varias columnas se conservan los puntos que LTTB elige en cualquiera de ellas.
+def reducir_serie(df, x, columnas, max_puntos=MAX_PUNTOS_SERIE):
+    if len(df) <= max_puntos:
+        return df
+    df = df.sort_values(x, kind="stable")
+    seleccion = np.unique(np.concatenate([lttb(df[x].to_numpy(), df[col].to_numpy(dtype=float), max_puntos)
+                                          for col in columnas]))
+    return df.iloc[seleccion]
@@ -0,0 +1,71 @@
+import threading
+import time
+import logging
+from utils import almacen, cache
+from utils import modelos as almacen_modelos
+
+# Retención de los datos de usuario del almacén.
+# Se mantiene un índice en memoria con el último uso de cada usuario (sin escribir en la base de
+# datos en cada lectura) y un hilo en segundo plano vuelca periódicamente el índice al almacén y
+# elimina los usuarios caducados con un único DELETE (sus datos se borran en cascada). Con ellos se
+# eliminan los modelos entrenados con sus datos.
+
+EDAD_MAXIMA_SEGUNDOS = 900   # Los datos de un usuario caducan tras 15 minutos sin usarse
+INTERVALO_BARRIDO = 60       # Como mucho un barrido por minuto
+
+# Usuarios cuyos datos son compartidos y no caducan nunca
+USUARIOS_PROTEGIDOS = {"muestra"}
+
+_ultimo_uso = {}  # user_id -> instante del último uso
+_lock = threading.Lock()
+_hilo = None
+_indice_inicializado = False
+
+logger = logging.getLogger(__name__)
+
+# Registrar que un usuario ha leído o escrito sus datos (aplaza su caducidad)
+def registrar_uso(user_id):
+    with _lock:
+        _ultimo_uso[user_id] = time.time()
+    iniciar_barrido_periodico()
+
+# Al arrancar el proceso se carga una sola vez el último uso de los usuarios ya guardados
+def _inicializar_indice():
+    global _indice_inicializado
+    if _indice_inicializado:
+        return
+    for user_id, uso in almacen.ultimos_usos().items():
+        _ultimo_uso[user_id] = max(_ultimo_uso.get(user_id, 0), uso)
+    _indice_inicializado = True
+
+# Eliminar los datos de los usuarios caducados. El índice se vuelca al almacén y se borran los
+# caducados en la misma transacción, con el lock tomado para que ningún uso nuevo se quede fuera.
+def barrer(edad_maxima_segundos=EDAD_MAXIMA_SEGUNDOS):
+    limite = time.time() - edad_maxima_segundos
+    with _lock:
+        _inicializar_indice()
+        caducados = almacen.caducar(_ultimo_uso, limite, USUARIOS_PROTEGIDOS)
+        # Del índice también salen los usuarios sin datos guardados que ya no se usan
+        for user_id in [user_id for user_id, uso in _ultimo_uso.items() if uso < limite]:
+            del _ultimo_uso[user_id]
+
+    for user_id in caducados:
+        cache.invalidar(user_id)
+        almacen_modelos.eliminar_modelos(user_id)
+    return caducados
+
+def _bucle_barrido():
+    while True:
+        time.sleep(INTERVALO_BARRIDO)
+        try:
+            barrer()
+        except Exception as e:
+            logger.warning(f"Error en el barrido de datos caducados: {e}")
+
+# Arrancar (una sola vez por proceso) el hilo que barre los datos caducados
+def iniciar_barrido_periodico():
+    global _hilo
+    with _lock:
+        if _hilo is None:
+            _hilo = threading.Thread(target=_bucle_barrido, name="retencion-datos", daemon=True)
+            _hilo.start()
@@ -0,0 +1,125 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+
+# Instrumentación de tiempos.
+# Cada tramo medido (carga de datos, descarga de Garmin, cálculo de una página, construcción de un
+# gráfico...) se acumula por proceso y por sesión, y se guarda la lista de tramos de la última
+# ejecución del script de cada sesión para el panel de depuración. Los tramos se anidan: un tramo
+# abierto dentro de otro queda registrado como su hijo. En hilos sin sesión (p. ej. tareas en
+# segundo plano) los tramos solo cuentan en el agregado del proceso.
+
+# Número de sesiones de las que se guardan los tiempos y tramos guardados por ejecución
+MAX_SESIONES = 100
+MAX_TRAMOS_EJECUCION = 500
+
+# Con GARMIN_LOG_TIEMPOS=1 cada tramo se escribe en el log (INFO) como una línea JSON; si no, en DEBUG
+NIVEL_LOG = logging.INFO if os.environ.get("GARMIN_LOG_TIEMPOS") else logging.DEBUG
+
+_proceso = {}  # nombre -> estadísticas
+_sesiones = OrderedDict()  # sesión -> {"agregado": {nombre: estadísticas}, "ultima": [tramos]}
+_lock = threading.Lock()
+
+_sesion = contextvars.ContextVar("sesion", default=None)
+_abiertos = contextvars.ContextVar("abiertos", default=())
+
+logger = logging.getLogger(__name__)
+
+# Marcar el inicio de una ejecución del script de una sesión: los tramos siguientes de este hilo
+# se atribuyen a la sesión y sustituyen a los de su ejecución anterior
+def iniciar_ejecucion(sesion):
+    _sesion.set(sesion)
+    _abiertos.set(())
+    with _lock:
+        datos = _sesiones.setdefault(sesion, {"agregado": {}, "ultima": []})
+        datos["ultima"] = []
+        _sesiones.move_to_end(sesion)
+        while len(_sesiones) > MAX_SESIONES:
+            _sesiones.popitem(last=False)
+
+def _acumular(agregado, nombre, segundos):
+    estadisticas = agregado.setdefault(nombre, {"llamadas": 0, "total_s": 0.0, "max_s": 0.0, "ultima_s": 0.0})
+    estadisticas["llamadas"] += 1
+    estadisticas["total_s"] += segundos
+    estadisticas["max_s"] = max(estadisticas["max_s"], segundos)
+    estadisticas["ultima_s"] = segundos
+
+# Registrar un tramo ya medido
+def registrar(nombre, segundos, **atributos):
+    abiertos = _abiertos.get()
+    sesion = _sesion.get()
+    tramo = {
+        "nombre": nombre,
+        "inicio": time.time() - segundos,
+        "segundos": segundos,
+        "nivel": len(abiertos),
+        "padre": abiertos[-1] if abiertos else None,
+        **atributos,
+    }
+    with _lock:
+        _acumular(_proceso, nombre, segundos)
+        datos = _sesiones.get(sesion)
+        if datos is not None:
+            _acumular(datos["agregado"], nombre, segundos)
+            if len(datos["ultima"]) < MAX_TRAMOS_EJECUCION:
+                datos["ultima"].append(tramo)
+    if logger.isEnabledFor(NIVEL_LOG):
+        logger.log(NIVEL_LOG, json.dumps({"evento": "tramo", "sesion": sesion, **tramo}, ensure_ascii=False, default=str))
+
+# Medir un bloque de código: with medir("load_data"): ...
+@contextmanager
+def medir(nombre, **atributos):
+    token = _abiertos.set(_abiertos.get() + (nombre,))
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        segundos = time.perf_counter() - inicio
+        _abiertos.reset(token)
+        registrar(nombre, segundos, **atributos)
+
+# Decorador para medir cada llamada a una función (por defecto con el nombre módulo.función)
+def cronometrado(nombre=None):
+    def decorador(funcion):
+        etiqueta = nombre or f"{funcion.__module__.split('.')[-1]}.{funcion.__name__}"
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with medir(etiqueta):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+# Cronómetro por vueltas para las secciones consecutivas de una página: cada llamada a la función
+# devuelta registra el tiempo desde la vuelta anterior como el tramo "prefijo.nombre"
+def cronometro(prefijo):
+    ultimo = [time.perf_counter()]
+    def vuelta(nombre):
+        ahora = time.perf_counter()
+        registrar(f"{prefijo}.{nombre}", ahora - ultimo[0])
+        ultimo[0] = time.perf_counter()
+    return vuelta
+
+def _ordenar(agregado):
+    return dict(sorted(((nombre, dict(e)) for nombre, e in agregado.items()), key=lambda x: -x[1]["total_s"]))
+
+# Informe de tiempos: tramos de la última ejecución de la sesión (en orden de inicio) y agregados
+# de la sesión y del proceso (de mayor a menor tiempo total)
+def informe(sesion=None):
+    with _lock:
+        datos = _sesiones.get(sesion, {"agregado": {}, "ultima": []})
+        return {
+            "sesion": sesion,
+            "ultima_ejecucion": sorted((dict(t) for t in datos["ultima"]), key=lambda t: t["inicio"]),
+            "agregado_sesion": _ordenar(datos["agregado"]),
+            "agregado_proceso": _ordenar(_proceso),
+        }
+
+# Informe de tiempos en JSON (p. ej. para st.download_button)
+def exportar_json(sesion=None):
+    return json.dumps(informe(sesion), ensure_ascii=False, indent=2, default=str)
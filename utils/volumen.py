@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+from utils.carga import obtener_carga
+from utils.renderizado import modo_render, reducir_serie
+from utils.tiempos import cronometrado
+
+# Volumen semanal de entrenamiento y riesgo de lesión.
+# Funciones de cálculo de la página de volumen semanal, sin dependencias de Streamlit: se pueden
+# ejecutar en otros procesos, cachear o medir en los benchmarks.
+
+# Deportes que siempre tienen columna de kilómetros, aunque no haya actividades de ese deporte
+DEPORTES_PRINCIPALES = ['running', 'cycling']
+
+# Nombre de las columnas de un deporte: 'running' -> 'Running', 'lap_swimming' -> 'Lap_Swimming'
+def nombre_deporte(deporte):
+    return str(deporte).title()
+
+# Umbrales del ratio de carga aguda:crónica (ACWR) a partir de los que aumenta el riesgo de lesión
+UMBRAL_ACWR_MODERADO = 1.3
+UMBRAL_ACWR_ALTO = 1.5
+
+# Columnas de la tabla semanal cuando no hay ninguna actividad con fecha válida
+COLUMNAS_SEMANALES = [
+    'Semana', 'Kilometros_Running', 'Kilometros_Cycling', 'Tiempo_Total', 'Dias_Entrenamiento', 'FC_Reposo',
+    'Cambio_Km_Running %', 'Cambio_Km_Cycling %', 'Cambio_Tiempo_Total %', 'Riesgo_Lesion', 'Ratio_Carga',
+]
+
+# Etiqueta de cada semana ("inicio a fin") a partir de sus periodos semanales
+def etiquetas_semana(semanas):
+    return semanas.start_time.strftime('%Y-%m-%d') + ' a ' + semanas.end_time.strftime('%Y-%m-%d')
+
+# Función para procesar datos por semana.
+# Las métricas se agregan de una vez por semana y deporte (sin filtrar el DataFrame dentro de cada
+# grupo) y las etiquetas de las semanas se calculan solo para las semanas distintas.
+# Además de las columnas de running y cycling se añaden kilómetros, tiempo y actividades de
+# cualquier otro deporte que aparezca en los datos.
+@cronometrado()
+def calcular_volumen_semanal(df):
+    # Verificar si la columna 'Fecha de Inicio' existe
+    if 'Fecha de Inicio' not in df.columns:
+        raise ValueError("La columna 'Fecha de Inicio' no se encuentra en los datos.")
+
+    # Convertir a datetime con manejo de errores y eliminar filas con fechas inválidas (NaT).
+    # Solo se copian las columnas necesarias, no todo el DataFrame.
+    fechas = pd.to_datetime(df['Fecha de Inicio'], errors='coerce')
+    validas = fechas.notna()
+    datos = pd.DataFrame({
+        'Semana': fechas[validas].dt.to_period('W'),
+        'Deporte': df.loc[validas, 'Deporte'].astype(object),
+        'Distancia (m)': df.loc[validas, 'Distancia (m)'],
+        'Duración (min)': df.loc[validas, 'Duración (min)'],
+        'Tasa Metabólica Basal': df.loc[validas, 'Tasa Metabólica Basal'],
+    })
+    if datos.empty:
+        return pd.DataFrame(columns=COLUMNAS_SEMANALES)
+
+    # Métricas totales por semana (solo las semanas con alguna actividad)
+    semanal = datos.groupby('Semana').agg(
+        Tiempo_Total=('Duración (min)', 'sum'),
+        Dias_Entrenamiento=('Semana', 'size'),
+        FC_Reposo=('Tasa Metabólica Basal', 'mean')
+    )
+    semanal['Tiempo_Total'] = semanal['Tiempo_Total'] / 60
+
+    # Métricas por semana y deporte en una sola agregación: una columna por deporte
+    por_deporte = datos.groupby(['Semana', 'Deporte']).agg(
+        Kilometros=('Distancia (m)', 'sum'),
+        Tiempo=('Duración (min)', 'sum'),
+        Actividades=('Deporte', 'size')
+    ).unstack('Deporte', fill_value=0).reindex(semanal.index, fill_value=0)
+    kilometros = por_deporte['Kilometros'] / 1000
+    tiempo = por_deporte['Tiempo'] / 60
+    actividades = por_deporte['Actividades']
+
+    # Deportes principales primero y el resto de mayor a menor distancia; los deportes sin
+    # distancia (p. ej. fuerza) no tienen columna de kilómetros
+    deportes = DEPORTES_PRINCIPALES + [d for d in kilometros.sum().sort_values(ascending=False).index
+                                       if d not in DEPORTES_PRINCIPALES]
+    total_km = kilometros.sum()
+    deportes_km = [d for d in deportes if d in DEPORTES_PRINCIPALES or total_km.get(d, 0) > 0]
+    kilometros = kilometros.reindex(columns=deportes_km, fill_value=0)
+    kilometros.columns = [f"Kilometros_{nombre_deporte(d)}" for d in deportes_km]
+
+    # Etiqueta de cada semana, calculada una vez por semana distinta
+    resumen = pd.concat([kilometros, semanal], axis=1)
+    resumen.insert(0, 'Semana', etiquetas_semana(semanal.index))
+    resumen = resumen.reset_index(drop=True)
+
+    # Calcular el cambio porcentual para las columnas de kilómetros y tiempo
+    for columna in kilometros.columns:
+        resumen = calcular_cambio_porcentual(resumen, columna, columna.replace('Kilometros_', 'Cambio_Km_') + ' %')
+    resumen = calcular_cambio_porcentual(resumen, 'Tiempo_Total', 'Cambio_Tiempo_Total %')
+
+    # Crear la columna Riesgo_Lesion basada en el cambio porcentual de Tiempo_Total
+    resumen['Riesgo_Lesion'] = np.where(resumen['Cambio_Tiempo_Total %'] > 20, 'Alto', 'Normal')
+
+    # Calcular Ratio de Carga
+    promedio_historico = resumen['Tiempo_Total'].mean()
+    resumen['Ratio_Carga'] = resumen['Tiempo_Total'] / promedio_historico
+
+    # Tiempo (horas) y número de actividades de cada deporte
+    deportes_presentes = [d for d in deportes if d in tiempo.columns]
+    for prefijo, tabla in [('Tiempo', tiempo), ('Dias_Entrenamiento', actividades)]:
+        tabla = tabla[deportes_presentes].reset_index(drop=True)
+        tabla.columns = [f"{prefijo}_{nombre_deporte(d)}" for d in deportes_presentes]
+        resumen = pd.concat([resumen, tabla], axis=1)
+
+    return resumen
+
+# Función para calcular el cambio porcentual de una columna semanal
+def calcular_cambio_porcentual(df_semanal, columna, columna_cambio):
+    # Calcular el cambio porcentual respecto a la semana anterior
+    cambio = df_semanal[columna].pct_change(fill_method=None) * 100
+
+    # Reemplazar valores infinitos por 100 (asumiendo un 100% de incremento si fue cero antes)
+    # y NaN (primera fila o dos semanas seguidas a cero) por 0
+    df_semanal[columna_cambio] = cambio.replace([np.inf, -np.inf], 100).fillna(0)
+
+    return df_semanal
+
+# Añadir a cada semana la carga de entrenamiento (ATL, CTL, TSB y ACWR) de su último día y el
+# riesgo de lesión según el ACWR
+@cronometrado()
+def añadir_carga_semanal(df_semanal, carga):
+    if carga.empty:
+        return df_semanal
+    fin_semana = carga.groupby(carga['Fecha'].dt.to_period('W'))[['ATL', 'CTL', 'TSB', 'ACWR']].last()
+    fin_semana.index = etiquetas_semana(fin_semana.index)
+    df_semanal = df_semanal.join(fin_semana, on='Semana')
+    df_semanal['Riesgo_ACWR'] = np.select(
+        [df_semanal['ACWR'] > UMBRAL_ACWR_ALTO, df_semanal['ACWR'] > UMBRAL_ACWR_MODERADO],
+        ['Alto', 'Moderado'], default='Normal'
+    )
+    return df_semanal
+
+# Evolución diaria de la carga aguda (fatiga), crónica (forma) y el balance entre ambas, con la
+# serie reducida con LTTB (conserva los picos) y WebGL si sigue teniendo muchos puntos
+@cronometrado()
+def figura_carga(carga):
+    serie = reducir_serie(carga, 'Fecha', ['ATL', 'CTL', 'TSB'])
+    return px.line(serie, x='Fecha', y=['ATL', 'CTL', 'TSB'], labels={'value': 'Carga (TRIMP)', 'variable': ''},
+                   render_mode=modo_render(3 * len(serie)))
+
+# Datos de la página: tabla semanal con los indicadores de riesgo y la carga de entrenamiento,
+# serie diaria de carga y su gráfico (None si no hay carga)
+def analizar_volumen(user_id, df):
+    carga = obtener_carga(user_id, df)
+    return {
+        "semanal": añadir_carga_semanal(calcular_volumen_semanal(df), carga),
+        "carga": carga,
+        "figura_carga": figura_carga(carga) if not carga.empty else None,
+    }